@@ -0,0 +1,6 @@
+"""
+Benchmark offline do processador de análise de código.
+
+Executa o SQSCodeAnalysisProcessor de ponta a ponta contra SQS/DynamoDB locais (moto ou LocalStack)
+e um modelo LLM falso com latência e taxa de erros configuráveis.
+"""
@@ -0,0 +1,128 @@
+"""
+Modelo de chat falso que substitui o ChatGoogleGenerativeAI nos benchmarks.
+"""
+import re
+import json
+import time
+import random
+import threading
+from typing import Any, List, Optional, Tuple
+from google.api_core.exceptions import InternalServerError, ResourceExhausted
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+FILE_PATH_PATTERN = re.compile(r"Esse código encontra-se no arquivo (.+?)\.\n")
+CODE_PATTERN = re.compile(r"analise o código abaixo:\n\n(.*)\n\nEsse código encontra-se", re.DOTALL)
+FIXUP_PATTERN = re.compile(r"Resposta inválida:\n(.*)\n\nCorrija apenas o formato", re.DOTALL)
+
+
+class FakeGeminiChatModel(BaseChatModel):
+    """
+    Simula o Gemini: responde com sugestões válidas no formato do PydanticOutputParser
+    após uma latência configurável, falhando aleatoriamente com erros 429 ou 500 ou
+    devolvendo JSON malformado (cercas de markdown, vírgula sobrando ou saída truncada).
+    """
+
+    latency: float = 0.5
+    jitter: float = 0.1
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    malformed_rate: float = 0.0
+    suggestions_per_file: int = 2
+    seed: Optional[int] = None
+
+    _random: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll = self._random.random()
+            malformed = self._random.random() < self.malformed_rate
+
+        time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise InternalServerError("500 An internal error has occurred.")
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        fixup = FIXUP_PATTERN.search(prompt)
+        if fixup:
+            return self._result(json.dumps({"suggestions": self._fix_suggestions(fixup.group(1))}))
+
+        content = json.dumps({"suggestions": self._build_suggestions(*self._parse_prompt(prompt))}, indent=2)
+        if malformed:
+            content = self._malform(content)
+        return self._result(content)
+
+    def _result(self, content: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _malform(self, content: str) -> str:
+        """
+        Corrompe a resposta de um dos jeitos comuns observados no Gemini.
+        """
+        with self._lock:
+            variant = self._random.randrange(2)
+        if variant == 0:
+            return f"```json\n{content[:-1].rstrip()},\n}}\n```"
+        # Saída truncada no meio da última sugestão
+        return content[:content.rfind('"modified_code"')]
+
+    def _fix_suggestions(self, invalid_output: str) -> List[dict]:
+        """
+        Responde a um pedido de correção completando os campos obrigatórios ausentes.
+        """
+        try:
+            items = json.loads(invalid_output).get("suggestions", [])
+        except (json.JSONDecodeError, AttributeError):
+            return []
+
+        defaults = {"description": "Modernizar trecho para Java 21", "start_line": 1, "end_line": 1,
+                    "original_snippet": "", "modified_code": "", "difficulty_level": 1, "analyzer": "java8to21"}
+        return [{**defaults, **item} for item in items if isinstance(item, dict) and "file_path" in item]
+
+    def _parse_prompt(self, prompt: str) -> Tuple[str, str]:
+        """
+        Extrai o caminho do arquivo e o código Java enviados no prompt.
+        """
+        file_path = FILE_PATH_PATTERN.search(prompt)
+        code = CODE_PATTERN.search(prompt)
+        return (file_path.group(1) if file_path else "Unknown.java", code.group(1) if code else "")
+
+    def _build_suggestions(self, file_path: str, java_code: str) -> List[dict]:
+        """
+        Gera sugestões determinísticas apontando para as primeiras instruções do arquivo.
+        """
+        statements = [
+            (line_number, line.strip())
+            for line_number, line in enumerate(java_code.splitlines(), start=1)
+            if line.strip().endswith(';') and not line.strip().startswith('import')
+        ]
+        chosen = statements[:self.suggestions_per_file]
+
+        return [
+            {
+                "file_path": file_path,
+                "description": "Modernizar trecho para Java 21",
+                "start_line": line_number,
+                "end_line": line_number,
+                "original_snippet": snippet,
+                "modified_code": snippet.replace("String ", "var "),
+                "difficulty_level": 1,
+                "last": index == len(chosen) - 1,
+                "analyzer": "java8to21",
+            }
+            for index, (line_number, snippet) in enumerate(chosen)
+        ]
@@ -0,0 +1,331 @@
+"""
+Benchmark de ponta a ponta do SQSCodeAnalysisProcessor.
+
+Envia requisições de análise de repositórios sintéticos para uma fila SQS local, executa o loop
+real do processador com um LLM falso e mede throughput, tempo até a primeira sugestão e memória.
+
+Uso (a partir de agents/java-migrate):
+    python -m benchmark.run --messages 20 --files-per-repo 10 --latency 0.2
+    python -m benchmark.run --endpoint-url http://localhost:4566     # LocalStack em vez de moto
+    python -m benchmark.run --compare benchmark/results/<anterior>.json
+"""
+import os
+import sys
+import math
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+import boto3
+from boto3.dynamodb.conditions import Attr
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+
+from main import SQSCodeAnalysisProcessor, LangChainAgent, Analyze, AnalyzerEnum
+from prompts.java_migration_prompt import system_prompt
+from suggestion_store import table_definition, SUGGESTION_KEY_PREFIX
+from similarity_index import table_definition as fingerprints_table_definition
+from benchmark.fake_llm import FakeGeminiChatModel
+from benchmark.synthetic_repo import generate_repo
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class InstrumentedProcessor(SQSCodeAnalysisProcessor):
+    """
+    Processador que registra os eventos necessários para as métricas do benchmark.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.first_suggestion_at: Dict[str, float] = {}
+        self.attempts = 0
+        # Reentregas da mesma mensagem também chegam a deletar; a conclusão é contada por ID da análise
+        self.completed_ids: Set[str] = set()
+        self._message_ids: Dict[str, str] = {}
+        self.files_analyzed = 0
+        self.suggestions_saved = 0
+
+    @property
+    def completed(self) -> int:
+        return len(self.completed_ids)
+
+    async def process_code_analysis_request(self, message_body: Dict[Any, Any], receipt_handle: str, *args, **kwargs) -> None:
+        self.attempts += 1
+        self._message_ids[receipt_handle] = message_body.get('id')
+        await super().process_code_analysis_request(message_body, receipt_handle, *args, **kwargs)
+
+    async def _handle_analysis_results(self, request_id: str, suggestions_list, analyze_request: Analyze) -> None:
+        await super()._handle_analysis_results(request_id, suggestions_list, analyze_request)
+        self.files_analyzed += 1
+
+    async def _save_suggestion_to_dynamodb(self, suggestion, analyze_request: Analyze, request_id: str) -> None:
+        await super()._save_suggestion_to_dynamodb(suggestion, analyze_request, request_id)
+        self.suggestions_saved += 1
+        self.first_suggestion_at.setdefault(request_id, time.perf_counter())
+
+    async def _delete_message(self, receipt_handle: str) -> None:
+        await super()._delete_message(receipt_handle)
+        self.completed_ids.add(self._message_ids.pop(receipt_handle))
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    Calcula o percentil pelo método nearest-rank.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def peak_rss_mb() -> float:
+    """
+    Retorna o pico de memória residente do processo em MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é reportado em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_infrastructure(args: argparse.Namespace) -> Dict[str, str]:
+    """
+    Cria a fila SQS e as tabelas DynamoDB usadas pelo benchmark.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    sqs_client = boto3.client('sqs', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+    dynamodb = boto3.client('dynamodb', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+
+    queue_url = sqs_client.create_queue(
+        QueueName=f"benchmark-{suffix}",
+        Attributes={'VisibilityTimeout': str(args.visibility_timeout)}
+    )['QueueUrl']
+
+    table_name = f"CodeSuggestions-benchmark-{suffix}"
+    dynamodb.create_table(**table_definition(table_name))
+    dynamodb.get_waiter('table_exists').wait(TableName=table_name)
+
+    fingerprints_table_name = f"CodeFingerprints-benchmark-{suffix}"
+    dynamodb.create_table(**fingerprints_table_definition(fingerprints_table_name))
+    dynamodb.get_waiter('table_exists').wait(TableName=fingerprints_table_name)
+
+    return {'queue_url': queue_url, 'table_name': table_name, 'fingerprints_table_name': fingerprints_table_name}
+
+
+def delete_infrastructure(infrastructure: Dict[str, str]) -> None:
+    boto3.client('sqs', region_name=os.getenv('AWS_REGION', 'us-east-1')).delete_queue(QueueUrl=infrastructure['queue_url'])
+    dynamodb = boto3.client('dynamodb', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+    dynamodb.delete_table(TableName=infrastructure['table_name'])
+    dynamodb.delete_table(TableName=infrastructure['fingerprints_table_name'])
+
+
+def count_suggestions(table) -> int:
+    """
+    Conta as sugestões gravadas na tabela (scan paginado com Select=COUNT, sem os marcadores de conclusão).
+    """
+    kwargs = {'Select': 'COUNT', 'FilterExpression': Attr('SuggestionKey').begins_with(SUGGESTION_KEY_PREFIX)}
+    count = 0
+    while True:
+        response = table.scan(**kwargs)
+        count += response['Count']
+        if 'LastEvaluatedKey' not in response:
+            return count
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Executa o benchmark e retorna as métricas coletadas.
+    """
+    infrastructure = create_infrastructure(args)
+    os.environ['SQS_QUEUE_URL'] = infrastructure['queue_url']
+    os.environ['DYNAMODB_SUGGESTIONS_TABLE'] = infrastructure['table_name']
+    os.environ['DYNAMODB_FINGERPRINTS_TABLE'] = infrastructure['fingerprints_table_name']
+    os.environ['DEDUP_ENABLED'] = 'true' if args.dedup else 'false'
+    os.environ['SQS_WAIT_TIME_SECONDS'] = '1'
+    os.environ['SQS_IDLE_SLEEP_SECONDS'] = '0.1'
+
+    fake_llm = FakeGeminiChatModel(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        malformed_rate=args.malformed_rate,
+        suggestions_per_file=args.suggestions_per_file,
+        seed=args.seed
+    )
+    processor = InstrumentedProcessor(
+        max_workers=args.max_workers,
+        agent=LangChainAgent(prompt_template=system_prompt, llm=fake_llm, schema_mode=args.schema_mode)
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Os repositórios sintéticos são diretórios locais; só eles podem ser lidos pelo processador
+        processor.local_repos_root = workdir
+        repos = [
+            os.path.join(workdir, f"repo{index:04d}")
+            for index in range(args.messages)
+        ]
+        for index, repo in enumerate(repos):
+            generate_repo(repo, files=args.files_per_repo, size_factor=args.size_factor, seed=args.seed + index)
+
+        submitted_at: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        for repo in repos:
+            request = Analyze(id=uuid.uuid4(), repo=repo, analyzers=[AnalyzerEnum.JAVA8_TO_21])
+            processor.sqs_client.send_message(QueueUrl=processor.queue_url, MessageBody=request.model_dump_json())
+            submitted_at[str(request.id)] = time.perf_counter()
+
+        loop_task = asyncio.create_task(processor.start_event_driven_processing())
+        try:
+            while processor.completed < args.messages:
+                if time.perf_counter() - start > args.timeout:
+                    raise TimeoutError(f"Benchmark excedeu {args.timeout}s ({processor.completed}/{args.messages} mensagens concluídas)")
+                await asyncio.sleep(0.05)
+        finally:
+            processor.running = False
+            loop_task.cancel()
+            processor.stop()
+
+        elapsed = time.perf_counter() - start
+
+    # Reentregas regravam os mesmos itens; suggestions_saved conta gravações e suggestions_stored os itens na tabela
+    suggestions_stored = count_suggestions(processor.suggestions_table)
+
+    if args.endpoint_url:
+        delete_infrastructure(infrastructure)
+
+    time_to_first_suggestion = [
+        processor.first_suggestion_at[request_id] - sent
+        for request_id, sent in submitted_at.items()
+        if request_id in processor.first_suggestion_at
+    ]
+
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'messages': args.messages,
+        'files': args.messages * args.files_per_repo,
+        'message_attempts': processor.attempts,
+        'files_analyzed': processor.files_analyzed,
+        'suggestions_saved': processor.suggestions_saved,
+        'suggestions_stored': suggestions_stored,
+        'messages_per_s': round(args.messages / elapsed, 3),
+        'files_per_s': round(processor.files_analyzed / elapsed, 3),
+        'ttfs_p50_s': _round(percentile(time_to_first_suggestion, 50)),
+        'ttfs_p95_s': _round(percentile(time_to_first_suggestion, 95)),
+        'ttfs_p99_s': _round(percentile(time_to_first_suggestion, 99)),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'prefix_share': processor.agent.token_report()['prefix_share'],
+        'dedup': args.dedup,
+        'files_reused': processor.dedup_report()['reused'],
+        'reuse_rate': processor.dedup_report()['reuse_rate'],
+    }
+
+
+def save_results(args: argparse.Namespace, results: Dict[str, Any]) -> str:
+    """
+    Salva os resultados em JSON, identificados pelo commit atual.
+    """
+    commit = git_commit()
+    timestamp = datetime.now()
+    report = {
+        'timestamp': timestamp.isoformat(),
+        'git_commit': commit,
+        'python': sys.version.split()[0],
+        'backend': 'localstack' if args.endpoint_url else 'moto',
+        'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'output_dir')},
+        'results': results,
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    file_path = os.path.join(args.output_dir, f"{timestamp:%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    return file_path
+
+
+def compare_results(baseline_path: str, results: Dict[str, Any]) -> None:
+    """
+    Imprime a variação de cada métrica em relação a uma execução anterior.
+    """
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)['results']
+
+    print(f"\nComparação com {baseline_path}:")
+    for metric, value in results.items():
+        previous = baseline.get(metric)
+        if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+            print(f"  {metric:<20} {previous:>12} -> {value:<12} ({(value - previous) / previous * 100:+.1f}%)")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark offline do SQSCodeAnalysisProcessor")
+    parser.add_argument('--messages', type=int, default=10, help="Quantidade de requisições de análise (um repositório por mensagem)")
+    parser.add_argument('--files-per-repo', type=int, default=10, help="Arquivos .java por repositório sintético")
+    parser.add_argument('--size-factor', type=int, default=1, help="Multiplicador do tamanho dos arquivos de code_tests/")
+    parser.add_argument('--max-workers', type=int, default=5, help="Threads do processador para chamadas ao LLM")
+    parser.add_argument('--latency', type=float, default=0.2, help="Latência média do LLM falso em segundos")
+    parser.add_argument('--jitter', type=float, default=0.05, help="Variação máxima (+/-) da latência em segundos")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fração de chamadas que falham com erro 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fração de chamadas que falham com erro 429")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Fração de respostas com JSON malformado")
+    parser.add_argument('--suggestions-per-file', type=int, default=2, help="Sugestões geradas por arquivo")
+    parser.add_argument('--schema-mode', choices=['full', 'compact'], default='full', help="Modo das instruções de formato do prompt")
+    parser.add_argument('--dedup', action=argparse.BooleanOptionalAction, default=False, help="Reaproveita sugestões de arquivos quase idênticos (os arquivos sintéticos são cópias dos modelos)")
+    parser.add_argument('--visibility-timeout', type=int, default=120, help="Visibility timeout da fila em segundos; deve ser maior que o tempo de processamento de uma mensagem, senão ela é reentregue e processada em duplicidade (também é a espera até a nova tentativa de mensagens com falha)")
+    parser.add_argument('--timeout', type=float, default=600, help="Tempo máximo de execução em segundos")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--endpoint-url', default=None, help="Endpoint do LocalStack; sem ele o moto é usado em memória")
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help="Diretório onde o JSON de resultados é salvo")
+    parser.add_argument('--compare', default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--log-level', default='WARNING')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+    os.environ.setdefault('AWS_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    if args.endpoint_url:
+        os.environ['AWS_ENDPOINT_URL'] = args.endpoint_url
+        results = asyncio.run(run_benchmark(args))
+    else:
+        from moto import mock_aws
+
+        # O endpoint do LocalStack (vindo do .env) impediria o moto de interceptar as chamadas
+        os.environ.pop('AWS_ENDPOINT_URL', None)
+        with mock_aws():
+            results = asyncio.run(run_benchmark(args))
+
+    print(json.dumps(results, indent=2))
+    print(f"\nResultados salvos em {save_results(args, results)}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
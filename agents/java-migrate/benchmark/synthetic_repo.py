@@ -0,0 +1,81 @@
+"""
+Gerador de repositórios Java sintéticos a partir dos exemplos em code_tests/.
+"""
+import os
+import re
+import glob
+import random
+from typing import List, Optional
+
+CODE_TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code_tests')
+CLASS_PATTERN = re.compile(r"\bclass\s+(\w+)")
+
+
+def load_templates(templates_dir: str = CODE_TESTS_DIR) -> List[str]:
+    """
+    Carrega os arquivos Java usados como modelo.
+
+    Args:
+        templates_dir: Diretório com os arquivos .java de exemplo
+
+    Returns:
+        Lista com o conteúdo de cada arquivo
+    """
+    templates = []
+    for file_path in sorted(glob.glob(os.path.join(templates_dir, '*.java'))):
+        with open(file_path, encoding='utf-8') as file:
+            templates.append(file.read())
+
+    if not templates:
+        raise ValueError(f"Nenhum arquivo .java encontrado em {templates_dir}")
+    return templates
+
+
+def _scale_template(template: str, class_name: str, size_factor: int) -> str:
+    """
+    Renomeia a classe do modelo e replica seu corpo size_factor vezes.
+    """
+    original_name = CLASS_PATTERN.search(template).group(1)
+    source = re.sub(rf"\b{original_name}\b", class_name, template)
+
+    body_start = source.index('{', CLASS_PATTERN.search(source).end()) + 1
+    body_end = source.rindex('}')
+    body = source[body_start:body_end]
+
+    # Cada cópia do corpo recebe nomes de métodos distintos para continuar compilável
+    copies = [body] + [
+        re.sub(r"\b(\w+)(\s*\()", lambda m: f"{m.group(1)}{copy}{m.group(2)}" if m.group(1) == 'main' else m.group(0), body)
+        for copy in range(1, size_factor)
+    ]
+    return source[:body_start] + ''.join(copies) + source[body_end:]
+
+
+def generate_repo(root: str, files: int, size_factor: int = 1, seed: Optional[int] = None, templates_dir: str = CODE_TESTS_DIR) -> List[str]:
+    """
+    Gera um repositório sintético com arquivos baseados em code_tests/.
+
+    Args:
+        root: Diretório onde o repositório será criado
+        files: Quantidade de arquivos .java a gerar
+        size_factor: Multiplicador do tamanho de cada arquivo em relação ao modelo
+        seed: Semente para escolha determinística dos modelos
+        templates_dir: Diretório com os arquivos .java de exemplo
+
+    Returns:
+        Caminhos dos arquivos gerados
+    """
+    rng = random.Random(seed)
+    templates = load_templates(templates_dir)
+    generated = []
+
+    for index in range(files):
+        class_name = f"Synthetic{index:05d}"
+        package_dir = os.path.join(root, 'src', 'main', 'java', f"pkg{index // 100:03d}")
+        os.makedirs(package_dir, exist_ok=True)
+
+        file_path = os.path.join(package_dir, f"{class_name}.java")
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(_scale_template(rng.choice(templates), class_name, size_factor))
+        generated.append(file_path)
+
+    return generated
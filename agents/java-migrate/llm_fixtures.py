@@ -0,0 +1,158 @@
+"""
+Gravação e reprodução de respostas do LLM (fixtures) para execuções determinísticas e sem custo.
+
+Modos (variável LLM_FIXTURE_MODE):
+    off: chamadas normais ao LLM (padrão)
+    record: chama o LLM e grava hash do prompt -> resposta bruta
+    replay: responde a partir das gravações, sem acesso à rede
+
+Uso para rodar o corpus de code_tests/ (a partir de agents/java-migrate):
+    LLM_FIXTURE_MODE=record python llm_fixtures.py code_tests/
+    LLM_FIXTURE_MODE=replay python llm_fixtures.py code_tests/
+"""
+import os
+import sys
+import gzip
+import atexit
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+from langchain_core.messages import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'llm_responses.json.gz')
+FIXTURE_MODES = ('off', 'record', 'replay')
+
+
+def serialize_messages(messages: List[BaseMessage]) -> str:
+    """
+    Converte as mensagens enviadas ao LLM no texto usado para calcular o hash do prompt.
+    """
+    return '\n'.join(f"{message.type}: {message.content}" for message in messages)
+
+
+class FixtureNotFoundError(KeyError):
+    """
+    Nenhuma resposta gravada para o prompt solicitado no modo replay.
+    """
+
+
+class LLMFixtureStore:
+    """
+    Armazena respostas do LLM indexadas pelo hash SHA-256 do prompt em um único arquivo JSON compactado (gzip).
+
+    As gravações ficam em memória e o arquivo é escrito uma única vez em flush() (chamado também
+    ao encerrar o processo), para que as threads do LLM não aguardem a regravação do arquivo.
+    """
+
+    def __init__(self, file_path: str = DEFAULT_FIXTURE_PATH):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+        if os.path.exists(file_path):
+            with gzip.open(file_path, 'rt', encoding='utf-8') as file:
+                self._responses = json.load(file).get('responses', {})
+
+        logger.info(f"Fixtures do LLM carregadas de {file_path}: {len(self._responses)} respostas")
+        atexit.register(self.flush)
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def record(self, prompt: str, response: str, latency_s: float) -> None:
+        """
+        Grava a resposta bruta do LLM para o prompt (persistida no próximo flush()).
+
+        Args:
+            prompt: Prompt enviado ao LLM
+            response: Conteúdo bruto retornado pelo LLM
+            latency_s: Duração da chamada original em segundos
+        """
+        with self._lock:
+            self._responses[self.prompt_hash(prompt)] = {'response': response, 'latency_s': round(latency_s, 3)}
+            self._dirty = True
+
+    def replay(self, prompt: str, latency: Optional[str] = None) -> str:
+        """
+        Retorna a resposta gravada para o prompt.
+
+        Args:
+            prompt: Prompt que seria enviado ao LLM
+            latency: Latência simulada: segundos fixos, "recorded" para repetir a duração gravada ou None
+
+        Returns:
+            Conteúdo bruto gravado
+
+        Raises:
+            FixtureNotFoundError: Se não houver gravação para o prompt
+        """
+        prompt_hash = self.prompt_hash(prompt)
+        entry = self._responses.get(prompt_hash)
+        if entry is None:
+            raise FixtureNotFoundError(f"Nenhuma resposta gravada para o prompt {prompt_hash[:12]} em {self.file_path}")
+
+        if latency == 'recorded':
+            time.sleep(entry['latency_s'])
+        elif latency:
+            time.sleep(float(latency))
+
+        return entry['response']
+
+    def flush(self) -> None:
+        """
+        Persiste as gravações pendentes no arquivo (escrita atômica).
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                responses = dict(self._responses)
+                self._dirty = False
+
+            os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+            temp_path = f"{self.file_path}.tmp"
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+                json.dump({'version': 1, 'responses': responses}, file, sort_keys=True, separators=(',', ':'))
+            os.replace(temp_path, self.file_path)
+            logger.info(f"Fixtures do LLM salvas em {self.file_path}: {len(responses)} respostas")
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+
+def run_corpus(corpus_dir: str) -> None:
+    """
+    Executa o agente sobre todos os arquivos .java de um diretório, respeitando LLM_FIXTURE_MODE.
+
+    Args:
+        corpus_dir: Diretório com os arquivos .java (ex: code_tests/)
+    """
+    from main import LangChainAgent
+    from prompts.java_migration_prompt import system_prompt
+
+    agent = LangChainAgent(prompt_template=system_prompt)
+    start = time.perf_counter()
+
+    for file_name in sorted(os.listdir(corpus_dir)):
+        if not file_name.endswith('.java'):
+            continue
+        file_path = os.path.join(corpus_dir, file_name)
+        with open(file_path, encoding='utf-8') as file:
+            suggestions_list = agent.generate_suggestions(file.read(), file_path)
+        print(f"{file_path}: {len(suggestions_list.suggestions)} sugestões")
+
+    if agent.fixture_store:
+        agent.fixture_store.flush()
+    print(f"Corpus processado em {time.perf_counter() - start:.2f}s (modo {agent.fixture_mode})")
+
+
+if __name__ == '__main__':
+    run_corpus(sys.argv[1] if len(sys.argv) > 1 else 'code_tests')
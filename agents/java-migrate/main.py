@@ -1,21 +1,35 @@
 import os
 import json
 import asyncio
+import time
 import logging
+import threading
+import contextvars
+import functools
 import boto3
-from uuid import UUID, uuid4
+from uuid import UUID
 from enum import Enum
-from typing import Optional
+from typing import Optional, get_args
 from pydantic import BaseModel, Field
 from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Set, Tuple
 from datetime import datetime
 from decimal import Decimal
 from dotenv import load_dotenv
-from prompts.java_migration_prompt import system_prompt
+from prompts.java_migration_prompt import system_prompt, file_prompt, fixup_prompt
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from telemetry import setup_tracing, shutdown_tracing, extract_sqs_context
+from output_repair import repair_json, salvage_items
+from suggestion_store import SuggestionStore, DEFAULT_TABLE_NAME, suggestion_id
+from llm_fixtures import LLMFixtureStore, DEFAULT_FIXTURE_PATH, FIXTURE_MODES, serialize_messages
+from similarity_index import SimilarityIndex, Fingerprint, compute_fingerprint, DEFAULT_TABLE_NAME as DEFAULT_FINGERPRINTS_TABLE_NAME
 
 
 # Configuração de logging
@@ -24,6 +38,7 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 load_dotenv()
 
@@ -53,82 +68,353 @@ class Suggestion(BaseModel):
 class SuggestionsList(BaseModel):
     suggestions: List[Suggestion] = Field(description="Lista de todas as sugestões de migração encontradas no código analisado")
 
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa local de tokens (~4 caracteres por token), sem chamadas à API de contagem.
+    """
+    return max(1, len(text) // 4)
+
+@functools.lru_cache(maxsize=None)
+def get_format_instructions(schema_mode: str = 'full') -> str:
+    """
+    Gera as instruções de formato da resposta uma única vez por processo.
+    
+    Args:
+        schema_mode: "full" usa o JSON schema completo do PydanticOutputParser (com as descrições dos campos);
+            "compact" lista apenas os campos e tipos, reduzindo o prefixo enviado em cada chamada
+            
+    Returns:
+        Instruções de formato a serem incluídas no prompt
+    """
+    if schema_mode == 'full':
+        return PydanticOutputParser(pydantic_object=SuggestionsList).get_format_instructions()
+    if schema_mode != 'compact':
+        raise ValueError(f"PROMPT_SCHEMA_MODE inválido: {schema_mode}")
+    
+    def compact_type(annotation) -> str:
+        if annotation is str:
+            return 'string'
+        if annotation is int:
+            return 'integer'
+        if annotation is bool:
+            return 'boolean'
+        if isinstance(annotation, type) and issubclass(annotation, Enum):
+            return '|'.join(f'"{member.value}"' for member in annotation)
+        return '|'.join(compact_type(arg) if arg is not type(None) else 'null' for arg in get_args(annotation))
+    
+    # O id é gerado pelo processador e não precisa ser pedido ao modelo
+    fields = ', '.join(
+        f'"{name}": {compact_type(field.annotation)}'
+        for name, field in Suggestion.model_fields.items()
+        if name != 'id'
+    )
+    return (
+        "Responda somente com um objeto JSON válido, sem texto adicional, no formato:\n"
+        f'{{"suggestions": [{{{fields}}}]}}\n'
+        "Linhas são baseadas em 1; last=true apenas na última sugestão do arquivo."
+    )
+
 class LangChainAgent:
-    def __init__(self, prompt_template: str):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash", 
-            temperature=0,
-        )
+    def __init__(self, prompt_template: str, llm: Optional[BaseChatModel] = None, fixture_mode: Optional[str] = None, fixture_path: Optional[str] = None, file_template: str = file_prompt, schema_mode: Optional[str] = None):
+        # Modo de fixtures: off (padrão), record (grava respostas) ou replay (responde das gravações, sem rede)
+        self.fixture_mode = (fixture_mode or os.getenv('LLM_FIXTURE_MODE', 'off')).lower()
+        if self.fixture_mode not in FIXTURE_MODES:
+            raise ValueError(f"LLM_FIXTURE_MODE inválido: {self.fixture_mode}")
+        self.fixture_store = None
+        if self.fixture_mode != 'off':
+            self.fixture_store = LLMFixtureStore(fixture_path or os.getenv('LLM_FIXTURE_PATH', DEFAULT_FIXTURE_PATH))
+        self.replay_latency = os.getenv('LLM_FIXTURE_REPLAY_LATENCY')
+        
+        # Cache de contexto explícito do Gemini contendo o prefixo estático (opcional).
+        # Sem ele, o prefixo idêntico no início de cada chamada pode aproveitar o cache implícito do provedor,
+        # desde que tenha ao menos GEMINI_CACHE_MIN_TOKENS (mínimo do Gemini 2.5 Flash, também exigido no cache explícito).
+        self.cached_content = os.getenv('GEMINI_CACHED_CONTENT')
+        self.cache_min_tokens = int(os.getenv('GEMINI_CACHE_MIN_TOKENS', '1024'))
+        
+        # Um modelo alternativo pode ser injetado (ex: modelo falso usado no benchmark)
+        self.llm = llm
+        if self.llm is None and self.fixture_mode != 'replay':
+            self.llm = ChatGoogleGenerativeAI(
+                model="gemini-2.5-flash", 
+                temperature=0,
+                cached_content=self.cached_content,
+                response_mime_type="application/json",  # Modo JSON nativo do Gemini
+            )
         self.parser = PydanticOutputParser(pydantic_object=SuggestionsList)
-        self.prompt = PromptTemplate(template=prompt_template)
-        self.chain = self.llm | self.parser
+        self.fixup_prompt = PromptTemplate(template=fixup_prompt)
+        self.fixup_attempts = int(os.getenv('LLM_FIXUP_ATTEMPTS', '1'))
+        
+        # Prefixo estático (instruções + formato da resposta) montado uma única vez
+        self.schema_mode = (schema_mode or os.getenv('PROMPT_SCHEMA_MODE', 'full')).lower()
+        self.system_message = SystemMessage(
+            content=PromptTemplate(template=prompt_template).format(output_format=get_format_instructions(self.schema_mode))
+        )
+        self.file_prompt = PromptTemplate(template=file_template)
+        self.prefix_tokens = estimate_tokens(self.system_message.content)
+        if self.prefix_tokens < self.cache_min_tokens:
+            logger.warning(
+                f"Prefixo estático com ~{self.prefix_tokens} tokens (modo {self.schema_mode}), abaixo do mínimo de "
+                f"{self.cache_min_tokens} para o cache de contexto do Gemini: o prefixo será cobrado integralmente em cada chamada"
+            )
+        
+        self._token_lock = threading.Lock()
+        # prefix_tokens conta apenas o prefixo efetivamente enviado; com GEMINI_CACHED_CONTENT ele vai para cached_prefix_tokens
+        self.token_stats = {'calls': 0, 'prefix_tokens': 0, 'cached_prefix_tokens': 0, 'file_tokens': 0, 'input_tokens': 0, 'cached_tokens': 0}
 
     def generate_suggestions(self, java_code: str, file_path: str) -> SuggestionsList:
-        prompt = self.prompt.format(
+        file_message = HumanMessage(content=self.file_prompt.format(
             file_path=file_path,
-            code_class=java_code, 
-            output_format=self.parser.get_format_instructions()
+            code_class=java_code
+        ))
+        # Com cache explícito o prefixo já está no provedor e não é reenviado
+        messages = [file_message] if self.cached_content else [self.system_message, file_message]
+        
+        with tracer.start_as_current_span("llm.generate_suggestions", attributes={'code.file_path': file_path, 'llm.fixture_mode': self.fixture_mode}) as span:
+            response = self._invoke_llm(messages)
+            suggestions_list = self._parse_response(response.content, file_path)
+            # As chaves da tabela (SuggestionKey, RepoFile) usam o caminho do arquivo lido, não o que o LLM devolve
+            for suggestion in suggestions_list.suggestions:
+                suggestion.file_path = file_path
+            
+            self._account_tokens(file_path, file_message, response, span)
+            span.set_attribute('suggestions.count', len(suggestions_list.suggestions))
+            return suggestions_list
+
+    def _parse_response(self, raw_output: str, file_path: str) -> SuggestionsList:
+        """
+        Interpreta a resposta do LLM. Respostas malformadas são reparadas localmente mantendo as
+        sugestões válidas; apenas o que continuar inválido é reenviado em um pedido de correção curto,
+        em vez de reanalisar o arquivo (ou a mensagem inteira).
+        
+        Args:
+            raw_output: Conteúdo bruto da resposta
+            file_path: Caminho do arquivo analisado
+            
+        Returns:
+            Sugestões válidas do arquivo
+            
+        Raises:
+            OutputParserException: Se nenhuma sugestão puder ser aproveitada
+        """
+        try:
+            return self.parser.parse(raw_output)
+        except OutputParserException as e:
+            logger.warning(f"Resposta malformada para {file_path}, tentando reparo local: {str(e)[:200]}")
+        
+        with tracer.start_as_current_span("llm.repair_output", attributes={'code.file_path': file_path}) as span:
+            suggestions, invalid_output, errors = self._salvage(raw_output)
+            span.set_attribute('repair.salvaged', len(suggestions))
+            
+            attempts = 0
+            while invalid_output is not None and attempts < self.fixup_attempts:
+                attempts += 1
+                logger.info(f"Solicitando correção do formato para {file_path} ({len(errors)} erros)")
+                fixup_message = HumanMessage(content=self.fixup_prompt.format(
+                    file_path=file_path,
+                    errors='\n'.join(f"- {error[:500]}" for error in errors),
+                    invalid_output=invalid_output,
+                    output_format=get_format_instructions('compact')
+                ))
+                fixed, invalid_output, errors = self._salvage(self._invoke_llm([fixup_message]).content)
+                suggestions.extend(fixed)
+            
+            span.set_attribute('repair.fixup_calls', attempts)
+            span.set_attribute('repair.suggestions', len(suggestions))
+            
+            if invalid_output is not None:
+                if not suggestions:
+                    raise OutputParserException(f"Resposta inválida para {file_path} mesmo após reparo: {'; '.join(errors)[:500]}")
+                logger.warning(f"{len(errors)} sugestões inválidas descartadas para {file_path}")
+            
+            return SuggestionsList(suggestions=suggestions)
+
+    def _salvage(self, raw_output: str) -> Tuple[List[Suggestion], Optional[str], List[str]]:
+        """
+        Repara o JSON da resposta e separa as sugestões válidas das inválidas.
+        
+        Args:
+            raw_output: Conteúdo bruto da resposta
+            
+        Returns:
+            Tupla (sugestões válidas, trecho inválido a ser corrigido ou None, erros encontrados)
+        """
+        try:
+            valid, invalid = salvage_items(repair_json(raw_output), Suggestion)
+        except ValueError as e:
+            # JSON irrecuperável ou sem a lista de sugestões: a resposta inteira vai para correção
+            return [], raw_output, [str(e)]
+        
+        if not invalid:
+            return valid, None, []
+        return (
+            valid,
+            json.dumps({'suggestions': [item for item, _ in invalid]}, ensure_ascii=False),
+            [error for _, error in invalid]
         )
+
+    def _invoke_llm(self, messages: List[BaseMessage]) -> AIMessage:
+        """
+        Obtém a resposta do LLM, gravando ou reproduzindo fixtures conforme o modo configurado.
         
-        return self.chain.invoke(prompt)
+        Args:
+            messages: Mensagens enviadas ao LLM (prefixo estático + arquivo)
+            
+        Returns:
+            Mensagem de resposta do LLM
+        """
+        prompt = serialize_messages(messages)
+        if self.fixture_mode == 'replay':
+            return AIMessage(content=self.fixture_store.replay(prompt, self.replay_latency))
+        
+        start = time.perf_counter()
+        response = self.llm.invoke(messages)
+        
+        if self.fixture_mode == 'record':
+            self.fixture_store.record(prompt, response.content, time.perf_counter() - start)
+        return response
+
+    def _account_tokens(self, file_path: str, file_message: HumanMessage, response: AIMessage, span: trace.Span) -> None:
+        """
+        Registra os tokens do prefixo estático contra os tokens do arquivo em cada chamada.
+        
+        Args:
+            file_path: Caminho do arquivo analisado
+            file_message: Parte variável do prompt
+            response: Resposta do LLM (com usage_metadata quando disponível)
+            span: Span da chamada ao LLM
+        """
+        file_tokens = estimate_tokens(file_message.content)
+        # Com cache explícito o prefixo não é enviado na requisição
+        sent_prefix_tokens = 0 if self.cached_content else self.prefix_tokens
+        usage = response.usage_metadata or {}
+        input_tokens = usage.get('input_tokens', 0)
+        cached_tokens = (usage.get('input_token_details') or {}).get('cache_read', 0)
+        
+        with self._token_lock:
+            self.token_stats['calls'] += 1
+            self.token_stats['prefix_tokens'] += sent_prefix_tokens
+            self.token_stats['cached_prefix_tokens'] += self.prefix_tokens - sent_prefix_tokens
+            self.token_stats['file_tokens'] += file_tokens
+            self.token_stats['input_tokens'] += input_tokens
+            self.token_stats['cached_tokens'] += cached_tokens
+        
+        span.set_attribute('llm.prefix_tokens', sent_prefix_tokens)
+        span.set_attribute('llm.file_tokens', file_tokens)
+        span.set_attribute('llm.cached_tokens', cached_tokens)
+        logger.info(
+            f"Tokens do prompt para {file_path}: prefixo ~{sent_prefix_tokens}{f' (~{self.prefix_tokens} em cache no provedor)' if self.cached_content else ''}, "
+            f"arquivo ~{file_tokens} ({sent_prefix_tokens / max(1, sent_prefix_tokens + file_tokens):.0%} prefixo), "
+            f"entrada reportada {input_tokens}, em cache {cached_tokens}"
+        )
+
+    def token_report(self) -> Dict[str, Any]:
+        """
+        Resumo acumulado dos tokens enviados ao LLM por este agente.
+        """
+        with self._token_lock:
+            report = dict(self.token_stats)
+        total = report['prefix_tokens'] + report['file_tokens']
+        report['schema_mode'] = self.schema_mode
+        report['prefix_cache_eligible'] = self.prefix_tokens >= self.cache_min_tokens
+        report['prefix_share'] = round(report['prefix_tokens'] / total, 3) if total else 0.0
+        return report
 
 class SQSCodeAnalysisProcessor:
-    def __init__(self, max_workers: int = 5):
+    def __init__(self, max_workers: int = 5, agent: Optional[LangChainAgent] = None):
         """
         Inicializa o processador de análise de código via SQS.
         
         Args:
             max_workers: Número máximo de threads para processamento paralelo
+            agent: Agente LLM a ser utilizado (opcional, padrão usa o Gemini)
         """
-        self.agent = LangChainAgent(prompt_template=system_prompt)
+        self.agent = agent or LangChainAgent(prompt_template=system_prompt)
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.sqs_client = boto3.client('sqs', region_name=os.getenv('AWS_REGION', 'us-east-1'))
         self.dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_REGION', 'us-east-1'))
-        self.suggestions_table = self.dynamodb.Table(os.getenv('DYNAMODB_SUGGESTIONS_TABLE', 'CodeSuggestions'))
+        self.suggestions_table = self.dynamodb.Table(os.getenv('DYNAMODB_SUGGESTIONS_TABLE', DEFAULT_TABLE_NAME))
+        # Trechos de código muito grandes são movidos para o S3 quando o bucket de overflow está configurado
+        overflow_bucket = os.getenv('SUGGESTIONS_OVERFLOW_BUCKET')
+        self.suggestion_store = SuggestionStore(
+            self.suggestions_table,
+            s3_client=boto3.client('s3', region_name=os.getenv('AWS_REGION', 'us-east-1')) if overflow_bucket else None,
+            overflow_bucket=overflow_bucket
+        )
         self.queue_url = os.getenv('SQS_QUEUE_URL')
+        self.wait_time_seconds = int(os.getenv('SQS_WAIT_TIME_SECONDS', '20'))
+        self.idle_sleep_seconds = float(os.getenv('SQS_IDLE_SLEEP_SECONDS', '10'))
+        # Raiz permitida para análise de diretórios locais (sem padrão: desativado em produção)
+        self.local_repos_root = os.getenv('LOCAL_REPOS_ROOT')
         self.running = True
         
+        # Arquivos quase idênticos a outros já analisados reaproveitam as sugestões sem chamar o LLM.
+        # Desativado por padrão: exige a tabela de fingerprints (mesmo padrão do --dedup do benchmark)
+        self.similarity_index = None
+        if os.getenv('DEDUP_ENABLED', 'false').lower() == 'true':
+            self.similarity_index = SimilarityIndex(
+                self.dynamodb.Table(os.getenv('DYNAMODB_FINGERPRINTS_TABLE', DEFAULT_FINGERPRINTS_TABLE_NAME)),
+                threshold=float(os.getenv('DEDUP_THRESHOLD', '0.9'))
+            )
+        self._fingerprints_in_flight: Dict[str, asyncio.Event] = {}
+        self.dedup_stats = {'files': 0, 'reused': 0}
+        
         if not self.queue_url:
             raise ValueError("SQS_QUEUE_URL deve estar configurado nas variáveis de ambiente")
         
         logger.info(f"Processador iniciado com {max_workers} workers")
         logger.info(f"Utilizando fila SQS: {self.queue_url}")
         logger.info(f"Utilizando tabela DynamoDB: {self.suggestions_table.name}")
+        if self.similarity_index:
+            logger.info(f"Reaproveitamento de sugestões ativo (tabela {self.similarity_index.table.name}, similaridade mínima {self.similarity_index.threshold})")
 
-    async def process_code_analysis_request(self, message_body: Dict[Any, Any], receipt_handle: str) -> None:
+    async def process_code_analysis_request(self, message_body: Dict[Any, Any], receipt_handle: str, message_attributes: Optional[Dict[str, Any]] = None) -> None:
         """
         Processa uma requisição de análise de código de forma assíncrona.
         
         Args:
             message_body: Corpo da mensagem SQS contendo os dados para análise
             receipt_handle: Handle da mensagem para deletar após processamento
+            message_attributes: Atributos da mensagem SQS, incluindo o contexto de trace da API
         """
         start_time = datetime.now()
         
-        try:
-            # Carregar mensagem em uma instância de Analyze
-            analyze_request = Analyze(**message_body)
-            request_id = str(analyze_request.id) if analyze_request.id else 'unknown'
-            
-            logger.info(f"Iniciando processamento da requisição {request_id}")
-            logger.info(f"Repo: {analyze_request.repo}")
-            logger.info(f"Analisadores: {[analyzer.value for analyzer in analyze_request.analyzers]}")
-            
-            # Processar cada analisador configurado
-            for analyzer in analyze_request.analyzers:
-                await self._process_analyzer(analyze_request, analyzer, receipt_handle, request_id)
-            
-            # Deletar mensagem da fila após processamento bem-sucedido
-            await self._delete_message(receipt_handle)
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            logger.info(f"Requisição {request_id} processada com sucesso em {processing_time:.2f}s")
-            
-        except Exception as e:
-            processing_time = (datetime.now() - start_time).total_seconds()
-            logger.error(f"Erro ao processar requisição após {processing_time:.2f}s: {str(e)}")
-            # Em caso de erro, a mensagem não é deletada e voltará para a fila
-            # Você pode implementar uma fila DLQ (Dead Letter Queue) para mensagens com muitos erros
+        # Continuar o trace iniciado pela API (propagado nos atributos da mensagem)
+        with tracer.start_as_current_span(
+            "process_code_analysis_request",
+            context=extract_sqs_context(message_attributes),
+            kind=SpanKind.CONSUMER
+        ) as span:
+            try:
+                # Carregar mensagem em uma instância de Analyze
+                analyze_request = Analyze(**message_body)
+                request_id = str(analyze_request.id) if analyze_request.id else 'unknown'
+                span.set_attribute('analysis.id', request_id)
+                span.set_attribute('analysis.repo', analyze_request.repo)
+                
+                logger.info(f"Iniciando processamento da requisição {request_id}")
+                logger.info(f"Repo: {analyze_request.repo}")
+                logger.info(f"Analisadores: {[analyzer.value for analyzer in analyze_request.analyzers]}")
+                
+                # Processar cada analisador configurado
+                for analyzer in analyze_request.analyzers:
+                    await self._process_analyzer(analyze_request, analyzer, receipt_handle, request_id)
+                
+                # A API considera a análise concluída apenas após este marcador (e não pelo last de um arquivo)
+                await self._mark_analysis_done(analyze_request)
+                
+                # Deletar mensagem da fila após processamento bem-sucedido
+                await self._delete_message(receipt_handle)
+                
+                processing_time = (datetime.now() - start_time).total_seconds()
+                logger.info(f"Requisição {request_id} processada com sucesso em {processing_time:.2f}s")
+                
+            except Exception as e:
+                processing_time = (datetime.now() - start_time).total_seconds()
+                logger.error(f"Erro ao processar requisição após {processing_time:.2f}s: {str(e)}")
+                span.record_exception(e)
+                span.set_status(Status(StatusCode.ERROR, str(e)))
+                # Em caso de erro, a mensagem não é deletada e voltará para a fila
+                # Você pode implementar uma fila DLQ (Dead Letter Queue) para mensagens com muitos erros
 
     async def _process_analyzer(self, analyze_request: Analyze, analyzer: AnalyzerEnum, receipt_handle: str, request_id: str) -> None:
         """
@@ -143,12 +429,13 @@ class SQSCodeAnalysisProcessor:
         try:
             logger.info(f"Processando analisador {analyzer.value} para requisição {request_id}")
             
-            if analyzer == AnalyzerEnum.JAVA8_TO_21:
-                await self._process_java_migration(analyze_request, request_id)
-            elif analyzer == AnalyzerEnum.SIMPLER_3_TO_4:
-                await self._process_simpler_migration(analyze_request, request_id)
-            else:
-                logger.warning(f"Analisador não implementado: {analyzer.value}")
+            with tracer.start_as_current_span(f"analyzer {analyzer.value}", attributes={'analysis.analyzer': analyzer.value}):
+                if analyzer == AnalyzerEnum.JAVA8_TO_21:
+                    await self._process_java_migration(analyze_request, request_id)
+                elif analyzer == AnalyzerEnum.SIMPLER_3_TO_4:
+                    await self._process_simpler_migration(analyze_request, request_id)
+                else:
+                    logger.warning(f"Analisador não implementado: {analyzer.value}")
                 
         except Exception as e:
             logger.error(f"Erro ao processar analisador {analyzer.value} para requisição {request_id}: {str(e)}")
@@ -164,30 +451,206 @@ class SQSCodeAnalysisProcessor:
         """
         logger.info(f"Iniciando análise Java 8->21 para repo: {analyze_request.repo}")
         
-        # Aqui você implementaria a lógica para:
-        # 1. Clonar/acessar o repositório
-        # 2. Encontrar arquivos .java
-        # 3. Processar cada arquivo com o agente
+        # Repositórios locais (diretórios dentro de LOCAL_REPOS_ROOT) têm seus arquivos .java analisados em paralelo
+        # TODO: Implementar clone de repositórios remotos
+        java_files = self._list_java_files(analyze_request.repo)
         
-        # Por enquanto, vou simular com um exemplo
-        # TODO: Implementar acesso real ao repositório
+        if not java_files:
+            # Por enquanto, repositórios remotos são simulados com um exemplo
+            java_files = {f"{analyze_request.repo}/Example.java": "// Código exemplo do repositório"}
         
-        example_java_code = "// Código exemplo do repositório"
-        file_path = f"{analyze_request.repo}/Example.java"
+        # Numa reentrega, arquivos concluídos na entrega anterior não são analisados de novo
+        done_files = await self._done_files(analyze_request, AnalyzerEnum.JAVA8_TO_21)
+        if done_files:
+            logger.info(f"{len(done_files)} arquivos já concluídos em entrega anterior da análise {request_id}")
+            java_files = {file_path: java_code for file_path, java_code in java_files.items() if file_path not in done_files}
+            if not java_files:
+                return
         
-        # Executar análise em uma thread separada
-        loop = asyncio.get_event_loop()
-        suggestions_list = await loop.run_in_executor(
-            self.executor, 
-            self.agent.generate_suggestions, 
-            example_java_code, 
-            file_path
+        # Todos os arquivos terminam antes de a mensagem falhar; os que falharam são refeitos na reentrega
+        # e, como os IDs das sugestões são determinísticos, o que já tinha sido gravado é sobrescrito
+        outcomes = await asyncio.gather(*(
+            self._analyze_java_file(java_code, file_path, analyze_request, request_id)
+            for file_path, java_code in java_files.items()
+        ), return_exceptions=True)
+        
+        failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        results = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        reused = sum(1 for _, was_reused in results if was_reused)
+        self.dedup_stats['files'] += len(results)
+        self.dedup_stats['reused'] += reused
+        
+        if failures:
+            logger.error(f"{len(failures)} de {len(java_files)} arquivos falharam na análise {request_id}")
+            raise failures[0]
+        
+        logger.info(
+            f"Análise Java concluída para {request_id}: {len(java_files)} arquivos, "
+            f"{sum(count for count, _ in results)} sugestões geradas, "
+            f"{reused} arquivos reaproveitados ({reused / len(results):.0%})"
         )
+
+    async def _done_files(self, analyze_request: Analyze, analyzer: AnalyzerEnum) -> Set[str]:
+        """
+        Arquivos da análise já concluídos pelo analisador. Sem ID da análise não há como
+        distinguir uma reentrega de outra requisição, então nada é pulado.
+        """
+        if not analyze_request.id:
+            return set()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.suggestion_store.done_files, str(analyze_request.id), analyzer.value)
+
+    async def _mark_file_done(self, analyze_request: Analyze, analyzer: AnalyzerEnum, file_path: str) -> None:
+        """
+        Registra o arquivo como concluído depois que todas as suas sugestões foram gravadas.
+        """
+        if not analyze_request.id:
+            return
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.suggestion_store.mark_file_done, str(analyze_request.id), analyzer.value, file_path)
+
+    async def _mark_analysis_done(self, analyze_request: Analyze) -> None:
+        """
+        Registra a análise como concluída depois que todos os analisadores terminaram.
+        """
+        if not analyze_request.id:
+            return
+        with tracer.start_as_current_span("dynamodb.put_item", kind=SpanKind.CLIENT, attributes={'db.system': 'dynamodb', 'aws.dynamodb.table_names': [self.suggestions_table.name]}):
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.suggestion_store.mark_analysis_done, str(analyze_request.id))
+
+    def _list_java_files(self, repo: str) -> Dict[str, str]:
+        """
+        Lista os arquivos .java de um repositório local.
+        
+        O campo repo vem do corpo público do POST /analyze, então apenas diretórios dentro de
+        LOCAL_REPOS_ROOT são lidos. Sem a variável configurada, nenhum diretório local é analisado.
+        
+        Args:
+            repo: Caminho do repositório
+            
+        Returns:
+            Dicionário caminho -> conteúdo do arquivo (vazio se o repositório não for um diretório permitido)
+        """
+        if not self.local_repos_root or not os.path.isdir(repo):
+            return {}
         
-        logger.info(f"Análise Java concluída para {request_id}: {len(suggestions_list.suggestions)} sugestões geradas")
+        if not self._is_inside_local_root(repo):
+            logger.warning(f"Repositório {repo} fora de LOCAL_REPOS_ROOT, ignorando arquivos locais")
+            return {}
         
-        # Processar resultados
-        await self._handle_analysis_results(request_id, suggestions_list, analyze_request)
+        java_files = {}
+        for root, _, files in os.walk(repo):
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                # Links simbólicos podem apontar para fora da raiz permitida
+                if file_name.endswith('.java') and self._is_inside_local_root(file_path):
+                    with open(file_path, encoding='utf-8', errors='replace') as file:
+                        java_files[file_path] = file.read()
+        return java_files
+
+    def _is_inside_local_root(self, path: str) -> bool:
+        root = os.path.realpath(self.local_repos_root)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    async def _analyze_java_file(self, java_code: str, file_path: str, analyze_request: Analyze, request_id: str) -> Tuple[int, bool]:
+        """
+        Analisa um arquivo Java com o agente e salva as sugestões geradas.
+        Se um arquivo quase idêntico já foi analisado, reaproveita as sugestões dele sem chamar o LLM.
+        
+        Args:
+            java_code: Conteúdo do arquivo
+            file_path: Caminho do arquivo
+            analyze_request: Dados da requisição de análise
+            request_id: ID da requisição para logging
+            
+        Returns:
+            Tupla (quantidade de sugestões do arquivo, se as sugestões foram reaproveitadas)
+        """
+        loop = asyncio.get_event_loop()
+        fingerprint = None
+        owned_event = None
+        
+        if self.similarity_index:
+            fingerprint = await loop.run_in_executor(None, compute_fingerprint, java_code, file_path)
+            # Cópias idênticas analisadas ao mesmo tempo aguardam a primeira em vez de chamar o LLM em paralelo
+            in_flight = self._fingerprints_in_flight.get(fingerprint.content_hash)
+            if in_flight:
+                await in_flight.wait()
+            else:
+                owned_event = self._fingerprints_in_flight[fingerprint.content_hash] = asyncio.Event()
+        
+        try:
+            if fingerprint:
+                reused = await self._find_reusable_suggestions(java_code, file_path, fingerprint)
+                if reused:
+                    await self._handle_analysis_results(request_id, reused, analyze_request)
+                    await self._mark_file_done(analyze_request, AnalyzerEnum.JAVA8_TO_21, file_path)
+                    return len(reused.suggestions), True
+            
+            # Executar análise em uma thread separada, levando o contexto de trace junto
+            suggestions_list = await loop.run_in_executor(
+                self.executor, 
+                functools.partial(contextvars.copy_context().run, self.agent.generate_suggestions), 
+                java_code, 
+                file_path
+            )
+            
+            if fingerprint:
+                await self._index_analyzed_file(java_code, file_path, request_id, suggestions_list, fingerprint)
+            
+            # Processar resultados
+            await self._handle_analysis_results(request_id, suggestions_list, analyze_request)
+            await self._mark_file_done(analyze_request, AnalyzerEnum.JAVA8_TO_21, file_path)
+            return len(suggestions_list.suggestions), False
+        finally:
+            if owned_event:
+                owned_event.set()
+                self._fingerprints_in_flight.pop(fingerprint.content_hash, None)
+
+    async def _find_reusable_suggestions(self, java_code: str, file_path: str, fingerprint: Fingerprint) -> Optional[SuggestionsList]:
+        """
+        Busca no índice de similaridade sugestões de um arquivo quase idêntico já analisado.
+        Falhas no índice não interrompem a análise: o arquivo segue para o LLM.
+        
+        Returns:
+            Sugestões remapeadas para o arquivo atual, ou None se não houver correspondência
+        """
+        with tracer.start_as_current_span("similarity.lookup", kind=SpanKind.CLIENT, attributes={'code.filepath': file_path}) as span:
+            try:
+                loop = asyncio.get_event_loop()
+                match = await loop.run_in_executor(
+                    None,
+                    lambda: self.similarity_index.find_reusable(java_code, file_path, AnalyzerEnum.JAVA8_TO_21.value, fingerprint)
+                )
+                span.set_attribute('similarity.reused', match is not None)
+                if not match:
+                    return None
+                
+                suggestions, similarity = match
+                span.set_attribute('similarity.score', similarity)
+                return SuggestionsList(suggestions=[Suggestion.model_validate(suggestion) for suggestion in suggestions])
+            except Exception as e:
+                logger.warning(f"Erro ao consultar índice de similaridade para {file_path}: {str(e)}")
+                span.record_exception(e)
+                return None
+
+    async def _index_analyzed_file(self, java_code: str, file_path: str, request_id: str, suggestions_list: SuggestionsList, fingerprint: Fingerprint) -> None:
+        """
+        Registra o arquivo analisado pelo LLM no índice de similaridade para análises futuras.
+        """
+        # O ID é atribuído a cada gravação; o índice guarda apenas o conteúdo das sugestões
+        suggestions = [suggestion.model_dump(mode='json', exclude={'id'}) for suggestion in suggestions_list.suggestions]
+        with tracer.start_as_current_span("similarity.index", kind=SpanKind.CLIENT, attributes={'code.filepath': file_path}) as span:
+            try:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(
+                    None,
+                    lambda: self.similarity_index.add(java_code, file_path, AnalyzerEnum.JAVA8_TO_21.value, request_id, suggestions, fingerprint)
+                )
+            except Exception as e:
+                logger.warning(f"Erro ao indexar {file_path} no índice de similaridade: {str(e)}")
+                span.record_exception(e)
 
     async def _process_simpler_migration(self, analyze_request: Analyze, request_id: str) -> None:
         """
@@ -216,7 +679,13 @@ class SQSCodeAnalysisProcessor:
         
         try:
             # Salvar cada sugestão no DynamoDB
+            ordinals: Dict[Tuple[str, int, int], int] = {}
             for suggestion in suggestions_list.suggestions:
+                # O ID é sempre derivado da análise e do trecho, para que reentregas regravem os mesmos itens
+                span = (suggestion.file_path, suggestion.start_line, suggestion.end_line)
+                ordinals[span] = ordinals.get(span, -1) + 1
+                suggestion.id = suggestion_id(request_id, suggestion.analyzer.value, *span, ordinal=ordinals[span])
+                
                 await self._save_suggestion_to_dynamodb(suggestion, analyze_request, request_id)
                 
                 # Log da sugestão processada
@@ -243,15 +712,14 @@ class SQSCodeAnalysisProcessor:
             request_id: ID da requisição para referência
         """
         try:
-            # Gerar ID único para a sugestão se não existir
+            # Gerar ID para a sugestão se não existir (normalmente já atribuído em _handle_analysis_results)
             if not suggestion.id:
-                suggestion.id = uuid4()
+                suggestion.id = suggestion_id(request_id, suggestion.analyzer.value, suggestion.file_path, suggestion.start_line, suggestion.end_line)
             
-            # Configurar chaves conforme especificação da tabela DynamoDB
-            # HASH key (partition key) e RANGE key (sort key)
-            item = {
+            # As chaves do esquema v2 (SuggestionKey, StatusCreatedAt, RepoFile) são montadas pelo SuggestionStore
+            fields = {
                 'AnalysisId': request_id,  # HASH key (partition key)
-                'SuggestionId': str(suggestion.id),  # RANGE key (sort key)
+                'SuggestionId': str(suggestion.id),
                 'FilePath': suggestion.file_path,
                 'Analyzer': suggestion.analyzer.value,
                 'Description': suggestion.description,
@@ -275,11 +743,12 @@ class SQSCodeAnalysisProcessor:
             }
             
             # Salvar no DynamoDB de forma assíncrona
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.suggestions_table.put_item(Item=item)
-            )
+            with tracer.start_as_current_span("dynamodb.put_item", kind=SpanKind.CLIENT, attributes={'db.system': 'dynamodb', 'aws.dynamodb.table_names': [self.suggestions_table.name]}):
+                loop = asyncio.get_event_loop()
+                item = await loop.run_in_executor(
+                    None,
+                    lambda: self.suggestion_store.put(fields)
+                )
             
             logger.debug(f"Sugestão {item['SuggestionId']} salva no DynamoDB para análise {item['AnalysisId']}")
             
@@ -292,14 +761,15 @@ class SQSCodeAnalysisProcessor:
         Deleta mensagem da fila SQS após processamento bem-sucedido.
         """
         try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.sqs_client.delete_message(
-                    QueueUrl=self.queue_url,
-                    ReceiptHandle=receipt_handle
+            with tracer.start_as_current_span("sqs.delete_message", kind=SpanKind.CLIENT):
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(
+                    None,
+                    lambda: self.sqs_client.delete_message(
+                        QueueUrl=self.queue_url,
+                        ReceiptHandle=receipt_handle
+                    )
                 )
-            )
         except Exception as e:
             logger.error(f"Erro ao deletar mensagem da fila: {str(e)}")
 
@@ -314,7 +784,7 @@ class SQSCodeAnalysisProcessor:
                 lambda: self.sqs_client.receive_message(
                     QueueUrl=self.queue_url,
                     MaxNumberOfMessages=10,  # Recebe até 10 mensagens por vez
-                    WaitTimeSeconds=20,  # Long polling de 20 segundos
+                    WaitTimeSeconds=self.wait_time_seconds,  # Long polling (20 segundos por padrão)
                     MessageAttributeNames=['All']
                 )
             )
@@ -352,10 +822,11 @@ class SQSCodeAnalysisProcessor:
                             # Parse do corpo da mensagem
                             message_body = json.loads(message['Body'])
                             receipt_handle = message['ReceiptHandle']
+                            message_attributes = message.get('MessageAttributes', {})
                             
                             # Criar task para processamento assíncrono
                             task = asyncio.create_task(
-                                self.process_code_analysis_request(message_body, receipt_handle)
+                                self.process_code_analysis_request(message_body, receipt_handle, message_attributes)
                             )
                             tasks.append(task)
                             
@@ -372,14 +843,22 @@ class SQSCodeAnalysisProcessor:
                     logger.info(f"Iniciadas {len(tasks)} tasks de processamento assíncrono")
                     
                 else:
-                    # Sem mensagens - aguardar 10 segundos antes da próxima consulta
-                    logger.info("Nenhuma mensagem na fila. Aguardando 10 segundos...")
-                    await asyncio.sleep(10)
+                    # Sem mensagens - aguardar (10 segundos por padrão) antes da próxima consulta
+                    logger.info(f"Nenhuma mensagem na fila. Aguardando {self.idle_sleep_seconds} segundos...")
+                    await asyncio.sleep(self.idle_sleep_seconds)
                     
             except Exception as e:
                 logger.error(f"Erro no loop principal: {str(e)}")
                 await asyncio.sleep(10)  # Aguardar antes de tentar novamente
 
+    def dedup_report(self) -> Dict[str, Any]:
+        """
+        Totais de arquivos analisados e reaproveitados do índice de similaridade.
+        """
+        report = dict(self.dedup_stats)
+        report['reuse_rate'] = round(report['reused'] / report['files'], 3) if report['files'] else 0.0
+        return report
+
     def stop(self) -> None:
         """
         Para o processamento e limpa recursos.
@@ -387,12 +866,17 @@ class SQSCodeAnalysisProcessor:
         logger.info("Parando processamento...")
         self.running = False
         self.executor.shutdown(wait=True)
+        logger.info(f"Tokens enviados ao LLM: {self.agent.token_report()}")
+        if self.agent.fixture_store:
+            self.agent.fixture_store.flush()
+        logger.info(f"Reaproveitamento de sugestões: {self.dedup_report()}")
         logger.info("Processamento parado")
 
 async def main():
     """
     Função principal que inicia o processador de análise de código.
     """
+    setup_tracing(os.getenv('OTEL_SERVICE_NAME', 'java-migrate-agent'))
     processor = SQSCodeAnalysisProcessor(max_workers=5)
     
     try:
@@ -401,6 +885,7 @@ async def main():
         logger.info("Interrupção recebida. Parando processamento...")
     finally:
         processor.stop()
+        shutdown_tracing()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Migração e backfill da tabela de sugestões do esquema v1 (CodeSuggestions) para o esquema v2 (CodeSuggestionsV2).
+
+Lê a tabela de origem com scan paralelo e regrava cada item no formato v2 (chaves FILE#...#LINE#...,
+atributos dos GSIs e trechos comprimidos). A gravação é idempotente: executar novamente apenas
+sobrescreve os mesmos itens, então a migração pode ser repetida até o corte definitivo.
+
+Uso (a partir de agents/java-migrate):
+    python migrate_suggestions.py --create-table
+    python migrate_suggestions.py --source-table CodeSuggestions --target-table CodeSuggestionsV2 --segments 8
+    python migrate_suggestions.py --dry-run
+"""
+import os
+import logging
+import argparse
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
+from dotenv import load_dotenv
+from suggestion_store import SuggestionStore, table_definition, DEFAULT_TABLE_NAME
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+
+def legacy_item_to_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte um item v1 para os atributos aceitos pelo SuggestionStore.
+
+    Args:
+        item: Item do esquema v1 (AnalysisId + SuggestionId)
+
+    Returns:
+        Atributos da sugestão, sem as chaves derivadas do v2
+    """
+    fields = dict(item)
+    # Itens inseridos manualmente (ver README) não têm os campos de contexto
+    fields.setdefault('status', 'pending')
+    fields.setdefault('StartLine', 0)
+    fields.setdefault('FilePath', '')
+    return fields
+
+
+def migrate_segment(source_table_name: str, target_table_name: str, overflow_bucket: Optional[str], region: str,
+                    segment: int, total_segments: int, dry_run: bool) -> int:
+    """
+    Migra um segmento do scan paralelo.
+
+    Cada segmento roda em sua própria thread com uma sessão boto3 própria (resources não são thread-safe).
+    No dry-run os trechos grandes não são enviados ao S3.
+
+    Returns:
+        Quantidade de itens migrados no segmento
+    """
+    session = boto3.session.Session(region_name=region)
+    dynamodb = session.resource('dynamodb')
+    source_table = dynamodb.Table(source_table_name)
+    store = SuggestionStore(
+        dynamodb.Table(target_table_name),
+        s3_client=session.client('s3') if overflow_bucket and not dry_run else None,
+        overflow_bucket=None if dry_run else overflow_bucket
+    )
+
+    migrated = 0
+    scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments}
+
+    with store.table.batch_writer(overwrite_by_pkeys=['AnalysisId', 'SuggestionKey']) as batch:
+        while True:
+            response = source_table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                new_item = store.build_item(legacy_item_to_fields(item))
+                if not dry_run:
+                    batch.put_item(Item=new_item)
+                migrated += 1
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    logger.info(f"Segmento {segment + 1}/{total_segments}: {migrated} itens {'verificados' if dry_run else 'migrados'}")
+    return migrated
+
+
+def create_target_table(table_name: str, region: str) -> None:
+    client = boto3.client('dynamodb', region_name=region)
+    if table_name in client.list_tables()['TableNames']:
+        logger.info(f"Tabela {table_name} já existe")
+        return
+
+    client.create_table(**table_definition(table_name))
+    client.get_waiter('table_exists').wait(TableName=table_name)
+    logger.info(f"Tabela {table_name} criada com os índices RepoStatusIndex, RepoFileIndex e StatusIndex")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Migra sugestões do esquema v1 para o v2")
+    parser.add_argument('--source-table', default='CodeSuggestions')
+    parser.add_argument('--target-table', default=os.getenv('DYNAMODB_SUGGESTIONS_TABLE', DEFAULT_TABLE_NAME))
+    parser.add_argument('--overflow-bucket', default=os.getenv('SUGGESTIONS_OVERFLOW_BUCKET'))
+    parser.add_argument('--segments', type=int, default=4, help="Segmentos do scan paralelo")
+    parser.add_argument('--create-table', action='store_true', help="Cria a tabela v2 se ela não existir")
+    parser.add_argument('--dry-run', action='store_true', help="Apenas converte os itens, sem gravar")
+    args = parser.parse_args(argv)
+
+    region = os.getenv('AWS_REGION', 'us-east-1')
+    if args.create_table and not args.dry_run:
+        create_target_table(args.target_table, region)
+
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        totals = list(executor.map(
+            lambda segment: migrate_segment(
+                args.source_table, args.target_table, args.overflow_bucket, region,
+                segment, args.segments, args.dry_run
+            ),
+            range(args.segments)
+        ))
+
+    logger.info(f"Migração {'simulada' if args.dry_run else 'concluída'}: {sum(totals)} itens de {args.source_table} para {args.target_table}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Reparo local de respostas JSON malformadas do LLM e aproveitamento parcial dos itens válidos.
+
+Evita que uma resposta com um detalhe inválido (cercas de markdown, vírgula sobrando, saída
+truncada, um item com campo faltando) descarte todas as sugestões do arquivo.
+"""
+import re
+import json
+from typing import Any, Iterator, List, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+
+def _structural_chars(text: str) -> Iterator[Tuple[int, str]]:
+    """
+    Percorre o JSON ignorando o conteúdo de strings (as aspas de abertura são incluídas).
+
+    Returns:
+        Iterador de (posição, caractere) fora de strings
+    """
+    in_string = False
+    escaped = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        else:
+            if char == '"':
+                in_string = True
+            yield index, char
+
+
+def _scan(text: str) -> Tuple[List[str], int]:
+    """
+    Percorre a estrutura do JSON.
+
+    Returns:
+        Tupla (fechamentos pendentes, posição após o último valor completo)
+    """
+    stack = []
+    last_complete = 0
+
+    for index, char in _structural_chars(text):
+        if char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            last_complete = index + 1
+        elif char == ',':
+            last_complete = index
+
+    return stack, last_complete
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """
+    Remove vírgulas antes de } ou ], sem alterar o conteúdo de strings
+    (trechos Java como `{1, 2,}` em inicializadores de array são preservados).
+    """
+    trailing = set()
+    pending_comma = None
+
+    for index, char in _structural_chars(text):
+        if char == ',':
+            pending_comma = index
+        elif char in '}]':
+            if pending_comma is not None:
+                trailing.add(pending_comma)
+            pending_comma = None
+        elif not char.isspace():
+            pending_comma = None
+
+    return ''.join(char for index, char in enumerate(text) if index not in trailing)
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Fecha objetos e listas deixados abertos por uma resposta truncada.
+    """
+    stack, last_complete = _scan(text)
+    if not stack:
+        return text
+
+    # Descarta o trecho incompleto após o último valor fechado e fecha o que ficou aberto
+    repaired = text[:last_complete].rstrip().rstrip(',')
+    stack, _ = _scan(repaired)
+    return repaired + ''.join(reversed(stack))
+
+
+def repair_json(text: str) -> Any:
+    """
+    Tenta interpretar uma resposta JSON malformada.
+
+    Args:
+        text: Conteúdo bruto retornado pelo LLM
+
+    Returns:
+        Objeto JSON interpretado
+
+    Raises:
+        ValueError: Se a resposta não puder ser reparada
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    fenced = CODE_FENCE_PATTERN.search(text)
+    candidate = fenced.group(1) if fenced else text
+
+    starts = [index for index in (candidate.find('{'), candidate.find('[')) if index >= 0]
+    if not starts:
+        raise ValueError("Resposta não contém JSON")
+    candidate = candidate[min(starts):]
+
+    end = max(candidate.rfind('}'), candidate.rfind(']'))
+    for attempt in (candidate, candidate[:end + 1] if end >= 0 else candidate):
+        attempt = _remove_trailing_commas(attempt)
+        for fixed in (attempt, _close_truncated(attempt)):
+            try:
+                return json.loads(_remove_trailing_commas(fixed))
+            except json.JSONDecodeError:
+                continue
+
+    raise ValueError("Não foi possível reparar o JSON da resposta")
+
+
+def salvage_items(data: Any, model: Type[BaseModel], key: str = 'suggestions') -> Tuple[List[BaseModel], List[Tuple[Any, str]]]:
+    """
+    Valida individualmente cada item da resposta, mantendo os válidos.
+
+    Args:
+        data: JSON interpretado (objeto com a lista em `key` ou a própria lista)
+        model: Modelo Pydantic de cada item
+        key: Campo do objeto que contém a lista de itens
+
+    Returns:
+        Tupla (itens válidos, lista de (item inválido, erro))
+
+    Raises:
+        ValueError: Se a resposta não trouxer a lista de itens (campo ausente, com outro nome,
+            que não é uma lista, ou lista solta vazia), para que não seja confundida com "nenhum item"
+    """
+    if isinstance(data, dict):
+        items = data.get(key)
+    elif isinstance(data, list) and data:
+        items = data
+    else:
+        items = None
+    if not isinstance(items, list):
+        raise ValueError(f"Campo '{key}' ausente ou não é uma lista")
+
+    valid = []
+    invalid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError as e:
+            invalid.append((item, str(e)))
+    return valid, invalid
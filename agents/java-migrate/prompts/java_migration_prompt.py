@@ -14,12 +14,29 @@ Nível de Dificuldade: Uma pontuação de 1 a 5, onde:
 4: Dificuldade alta. Refatoração que impacta a lógica ou a estrutura da classe.
 5: Dificuldade muito alta. Alteração complexa, que pode exigir mudanças em outras partes da aplicação.
 
+{output_format}
+"""
+
+# Parte variável do prompt, enviada depois do prefixo estático (system_prompt) para que o
+# prefixo seja idêntico em todas as chamadas e possa ser reaproveitado pelo cache de contexto do provedor.
+file_prompt = """
 Segundo esses critérios, analise o código abaixo:
 
 {code_class}
 
 Esse código encontra-se no arquivo {file_path}.
+"""
+# Pedido de correção enviado quando a resposta de um arquivo não pôde ser reparada localmente.
+# Contém apenas o trecho inválido e os erros, não o código do arquivo.
+fixup_prompt = """
+A resposta abaixo, gerada para o arquivo {file_path}, não está no formato esperado.
 
-{output_format}
+Erros encontrados:
+{errors}
 
-"""
\ No newline at end of file
+Resposta inválida:
+{invalid_output}
+
+Corrija apenas o formato, sem alterar o conteúdo das sugestões.
+{output_format}
+"""
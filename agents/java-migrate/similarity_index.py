@@ -0,0 +1,317 @@
+"""
+Índice de similaridade para reaproveitar sugestões de código quase duplicado entre análises.
+
+Cada arquivo Java (uma classe de topo por arquivo) recebe uma assinatura MinHash calculada sobre
+shingles de tokens normalizados (sem comentários, literais substituídos). As assinaturas são
+divididas em bandas (LSH) gravadas no DynamoDB, de forma que encontrar candidatos parecidos
+custa poucas queries, independentemente do número de análises anteriores.
+
+Quando um arquivo já analisado é encontrado com similaridade acima do limite e a diferença entre
+eles não adiciona código, as sugestões gravadas são reaproveitadas com as linhas remapeadas para o
+novo arquivo, sem chamar o LLM.
+
+Layout da tabela (CodeFingerprints):
+    PK=HASH#<sha256>, SK=<fingerprint_id>         -> cópias exatas (após normalização)
+    PK=BAND#<banda>#<hash>, SK=<fingerprint_id>   -> candidatos por banda
+    PK=FP#<fingerprint_id>, SK=META              -> assinatura, código e sugestões (comprimidos)
+"""
+import os
+import re
+import json
+import zlib
+import struct
+import random
+import difflib
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_NAME = 'CodeFingerprints'
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 5
+MAX_CANDIDATES = 20
+# Itens do DynamoDB são limitados a 400 KB; arquivos maiores não são indexados
+MAX_INDEXED_SOURCE_BYTES = 300 * 1024
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240521)
+# Coeficientes fixos para que as assinaturas sejam comparáveis entre processos
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+STRING_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+CODE_OR_COMMENT_PATTERN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?\*/', re.DOTALL)
+TOKEN_PATTERN = re.compile(r"[A-Za-z_$][\w$]*|\d[\w.]*|\S")
+
+
+@dataclass
+class Fingerprint:
+    content_hash: str
+    signature: List[int]
+
+    def bands(self) -> List[str]:
+        return [
+            f"BAND#{band:02d}#{hashlib.blake2b(struct.pack(f'{ROWS_PER_BAND}Q', *self.signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]), digest_size=8).hexdigest()}"
+            for band in range(BANDS)
+        ]
+
+    def similarity(self, other_signature: List[int]) -> float:
+        return sum(a == b for a, b in zip(self.signature, other_signature)) / NUM_PERMUTATIONS
+
+
+def normalize_tokens(java_code: str, type_name: Optional[str] = None) -> List[str]:
+    """
+    Tokeniza o código removendo comentários e substituindo literais, para que cópias com
+    formatação ou textos diferentes tenham a mesma sequência de tokens.
+
+    Args:
+        java_code: Conteúdo do arquivo
+        type_name: Nome da classe de topo do arquivo, substituído por um marcador para que
+            cópias renomeadas sejam idênticas
+
+    Returns:
+        Lista de tokens normalizados
+    """
+    code = COMMENT_PATTERN.sub(' ', java_code)
+    code = STRING_PATTERN.sub(' STR ', code)
+    return [
+        'NUM' if token[0].isdigit() else 'TYPE' if token == type_name else token
+        for token in TOKEN_PATTERN.findall(code)
+    ]
+
+
+def compute_fingerprint(java_code: str, file_path: Optional[str] = None) -> Fingerprint:
+    """
+    Calcula a assinatura MinHash de um arquivo Java.
+
+    Args:
+        java_code: Conteúdo do arquivo
+        file_path: Caminho do arquivo; o nome (sem .java) é tratado como o nome da classe de topo
+
+    Returns:
+        Fingerprint com o hash exato do código normalizado e a assinatura MinHash
+    """
+    tokens = normalize_tokens(java_code, _type_name(file_path))
+    content_hash = hashlib.sha256(' '.join(tokens).encode('utf-8')).hexdigest()
+
+    shingles = {
+        int.from_bytes(hashlib.blake2b(' '.join(tokens[index:index + SHINGLE_SIZE]).encode('utf-8'), digest_size=8).digest(), 'big')
+        for index in range(max(1, len(tokens) - SHINGLE_SIZE + 1))
+    }
+    signature = [
+        min((a * shingle + b) % _MERSENNE_PRIME for shingle in shingles)
+        for a, b in _PERMUTATIONS
+    ]
+    return Fingerprint(content_hash=content_hash, signature=signature)
+
+
+def _type_name(file_path: Optional[str]) -> Optional[str]:
+    return os.path.splitext(os.path.basename(file_path))[0] if file_path else None
+
+
+def _code_lines(source: str) -> List[bool]:
+    """
+    Indica, para cada linha, se ela contém código (linhas em branco ou só com comentários não contam).
+    """
+    without_comments = CODE_OR_COMMENT_PATTERN.sub(
+        lambda match: '\n' * match.group().count('\n') if match.group().startswith('/') else match.group(),
+        source
+    )
+    return [bool(line.strip()) for line in without_comments.splitlines()]
+
+
+def _rename(text: Optional[str], old_name: str, new_name: str) -> Optional[str]:
+    return re.sub(rf"\b{re.escape(old_name)}\b", new_name, text) if text else text
+
+
+def remap_suggestions(old_source: str, new_source: str, suggestions: List[Dict[str, Any]], file_path: str, old_file_path: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Ajusta as linhas das sugestões do arquivo original para o arquivo quase duplicado.
+
+    O reaproveitamento só acontece quando a diferença não adiciona código: linhas novas ou alteradas
+    no arquivo atual nunca foram analisadas, então qualquer uma delas (exceto linhas em branco e
+    comentários) faz o arquivo seguir para o LLM. A única diferença de código aceita é o nome da
+    classe de topo (derivado do nome do arquivo), que também é atualizado no texto das sugestões.
+
+    Args:
+        old_source: Código do arquivo analisado anteriormente
+        new_source: Código do arquivo atual
+        suggestions: Sugestões gravadas para o arquivo original
+        file_path: Caminho do arquivo atual
+        old_file_path: Caminho do arquivo original (para o nome da classe de topo)
+
+    Returns:
+        Sugestões remapeadas, ou None se o arquivo atual tiver código novo ou algum trecho
+        sugerido não existir intacto nele
+    """
+    old_name, new_name = _type_name(old_file_path), _type_name(file_path)
+    renamed = bool(old_name and new_name and old_name != new_name)
+
+    old_lines = old_source.splitlines()
+    new_lines = new_source.splitlines()
+    if renamed:
+        # Compara as linhas com o nome da classe normalizado, como no fingerprint
+        old_lines = [_rename(line, old_name, 'TYPE') for line in old_lines]
+        new_lines = [_rename(line, new_name, 'TYPE') for line in new_lines]
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+    new_code_lines = _code_lines(new_source)
+    line_map = {}
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            for offset in range(old_end - old_start):
+                line_map[old_start + offset + 1] = new_start + offset + 1
+        elif any(new_code_lines[new_start:new_end]):
+            return None
+
+    remapped = []
+    for suggestion in suggestions:
+        start_line = int(suggestion['start_line'])
+        end_line = int(suggestion['end_line'])
+        mapped = [line_map.get(line) for line in range(start_line, end_line + 1)]
+        if None in mapped or mapped[-1] - mapped[0] != end_line - start_line:
+            return None
+
+        suggestion = {**suggestion, 'file_path': file_path, 'start_line': mapped[0], 'end_line': mapped[-1]}
+        if renamed:
+            for field in ('description', 'original_snippet', 'modified_code', 'additional_notes'):
+                suggestion[field] = _rename(suggestion.get(field), old_name, new_name)
+        remapped.append(suggestion)
+    return remapped
+
+
+class SimilarityIndex:
+    """
+    Índice LSH de arquivos já analisados, persistido no DynamoDB.
+    """
+
+    def __init__(self, table, threshold: float = 0.9):
+        self.table = table
+        self.threshold = threshold
+
+    def find_reusable(self, java_code: str, file_path: str, analyzer: str, fingerprint: Optional[Fingerprint] = None) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        Procura um arquivo quase duplicado já analisado e remapeia suas sugestões.
+
+        Args:
+            java_code: Conteúdo do arquivo atual
+            file_path: Caminho do arquivo atual
+            analyzer: Analisador que gerou as sugestões (só reaproveita do mesmo analisador)
+            fingerprint: Fingerprint já calculado do arquivo (opcional)
+
+        Returns:
+            Tupla (sugestões remapeadas, similaridade) ou None se não houver correspondência
+        """
+        fingerprint = fingerprint or compute_fingerprint(java_code, file_path)
+
+        candidates = self._candidates(fingerprint)
+        if not candidates:
+            return None
+
+        response = self.table.meta.client.batch_get_item(RequestItems={
+            self.table.name: {'Keys': [{'PK': f"FP#{fingerprint_id}", 'SK': 'META'} for fingerprint_id, _ in candidates.most_common(MAX_CANDIDATES)]}
+        })
+
+        scored = []
+        for item in response['Responses'].get(self.table.name, []):
+            if item['Analyzer'] != analyzer:
+                continue
+            signature = list(struct.unpack(f'{NUM_PERMUTATIONS}Q', bytes(getattr(item['Signature'], 'value', item['Signature']))))
+            similarity = 1.0 if item['ContentHash'] == fingerprint.content_hash else fingerprint.similarity(signature)
+            if similarity >= self.threshold:
+                scored.append((similarity, item))
+
+        for similarity, item in sorted(scored, key=lambda entry: entry[0], reverse=True):
+            old_source = zlib.decompress(bytes(getattr(item['Source'], 'value', item['Source']))).decode('utf-8')
+            suggestions = json.loads(zlib.decompress(bytes(getattr(item['Suggestions'], 'value', item['Suggestions']))))
+            remapped = remap_suggestions(old_source, java_code, suggestions, file_path, item['FilePath'])
+            if remapped is not None:
+                logger.info(f"Arquivo {file_path} reaproveita sugestões de {item['FilePath']} (similaridade {similarity:.2f})")
+                return remapped, similarity
+        return None
+
+    def _candidates(self, fingerprint: Fingerprint) -> Counter:
+        """
+        IDs de arquivos possivelmente parecidos, contando em quantas bandas cada um coincide.
+        Cópias exatas são resolvidas com uma única query, sem consultar as bandas.
+        """
+        candidates = Counter()
+        response = self.table.query(KeyConditionExpression=Key('PK').eq(f"HASH#{fingerprint.content_hash}"), ProjectionExpression='SK')
+        candidates.update({item['SK']: BANDS for item in response.get('Items', [])})
+        if candidates:
+            return candidates
+
+        for band in fingerprint.bands():
+            response = self.table.query(KeyConditionExpression=Key('PK').eq(band), ProjectionExpression='SK')
+            candidates.update(item['SK'] for item in response.get('Items', []))
+        return candidates
+
+    def add(self, java_code: str, file_path: str, analyzer: str, analysis_id: str, suggestions: List[Dict[str, Any]], fingerprint: Optional[Fingerprint] = None) -> None:
+        """
+        Registra um arquivo analisado e suas sugestões no índice.
+
+        Args:
+            java_code: Conteúdo do arquivo
+            file_path: Caminho do arquivo
+            analyzer: Analisador que gerou as sugestões
+            analysis_id: ID da análise de origem
+            suggestions: Sugestões geradas pelo LLM (podem ser vazias)
+            fingerprint: Fingerprint já calculado do arquivo (opcional)
+        """
+        source = zlib.compress(java_code.encode('utf-8'), 9)
+        if len(source) > MAX_INDEXED_SOURCE_BYTES:
+            logger.debug(f"Arquivo {file_path} muito grande para o índice de similaridade")
+            return
+
+        fingerprint = fingerprint or compute_fingerprint(java_code, file_path)
+        fingerprint_id = hashlib.sha256(f"{analyzer}#{analysis_id}#{file_path}".encode('utf-8')).hexdigest()[:32]
+
+        with self.table.batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+            batch.put_item(Item={
+                'PK': f"FP#{fingerprint_id}",
+                'SK': 'META',
+                'Analyzer': analyzer,
+                'AnalysisId': analysis_id,
+                'FilePath': file_path,
+                'ContentHash': fingerprint.content_hash,
+                'Signature': struct.pack(f'{NUM_PERMUTATIONS}Q', *fingerprint.signature),
+                'Source': source,
+                'Suggestions': zlib.compress(json.dumps(suggestions).encode('utf-8'), 9),
+                'created_at': datetime.now().isoformat(),
+            })
+            batch.put_item(Item={'PK': f"HASH#{fingerprint.content_hash}", 'SK': fingerprint_id})
+            for band in fingerprint.bands():
+                batch.put_item(Item={'PK': band, 'SK': fingerprint_id})
+
+
+def table_definition(table_name: str = DEFAULT_TABLE_NAME) -> Dict[str, Any]:
+    """
+    Parâmetros de create_table para a tabela do índice de similaridade (usado pelo benchmark e setup local).
+
+    Args:
+        table_name: Nome da tabela
+
+    Returns:
+        Argumentos para DynamoDB.Client.create_table
+    """
+    return {
+        'TableName': table_name,
+        'AttributeDefinitions': [
+            {'AttributeName': 'PK', 'AttributeType': 'S'},
+            {'AttributeName': 'SK', 'AttributeType': 'S'},
+        ],
+        'KeySchema': [
+            {'AttributeName': 'PK', 'KeyType': 'HASH'},
+            {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    }
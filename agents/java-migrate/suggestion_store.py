@@ -0,0 +1,346 @@
+"""
+Esquema v2 da tabela de sugestões no DynamoDB.
+
+Chaves:
+    AnalysisId (HASH) + SuggestionKey (RANGE) = FILE#<caminho>#LINE#<linha inicial>#<SuggestionId>
+    permite leituras por faixa dentro de um arquivo (begins_with FILE#<caminho>#) já ordenadas por linha.
+
+    Na mesma partição, DONE#<analisador>#FILE#<caminho> marca um arquivo já analisado, para que a
+    reentrega da mensagem não o analise de novo, e DONE#ANALYSIS marca a análise inteira como concluída
+    (lido pela API). Os marcadores não têm repo/status e ficam fora dos índices.
+
+Índices secundários globais:
+    RepoStatusIndex: repo + StatusCreatedAt (<status>#<created_at>) -> "sugestões pendentes do repo X"
+    RepoFileIndex: RepoFile (<repo>#<caminho relativo>) + created_at -> "sugestões do arquivo Y em todas as análises"
+
+Não há índice com status na chave de partição: com poucos valores possíveis, todas as gravações cairiam
+na partição "pending". Consultas por status são sempre por repositório (RepoStatusIndex).
+
+Trechos de código grandes são comprimidos (zlib) em atributos binários e, acima do limite de overflow,
+movidos para o S3 quando SUGGESTIONS_OVERFLOW_BUCKET estiver configurado.
+
+Este módulo é compartilhado com a API (a imagem copia este arquivo, ver api/Dockerfile), para que o
+formato das chaves seja sempre o mesmo na escrita (processador) e na leitura (API).
+"""
+import json
+import zlib
+import uuid
+import base64
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple
+from boto3.dynamodb.conditions import Key, Attr
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+DEFAULT_TABLE_NAME = 'CodeSuggestionsV2'
+
+# Trechos acima de COMPRESS_THRESHOLD bytes são comprimidos; acima de OVERFLOW_THRESHOLD (já comprimidos) vão para o S3
+COMPRESS_THRESHOLD = 1024
+OVERFLOW_THRESHOLD = 64 * 1024
+
+# Tamanho padrão das páginas das consultas por repositório/arquivo, cujo histórico cresce a cada análise
+DEFAULT_PAGE_SIZE = 50
+
+# Namespace fixo dos IDs determinísticos das sugestões (ver suggestion_id)
+SUGGESTION_ID_NAMESPACE = uuid.UUID('fffcdaa7-ec4b-4b8c-a3db-c57fee04dcf7')
+
+SUGGESTION_KEY_PREFIX = 'FILE#'
+DONE_KEY_PREFIX = 'DONE#'
+
+SNIPPET_FIELDS = ('OriginalSnippet', 'ModifiedCode')
+
+
+def table_definition(table_name: str = DEFAULT_TABLE_NAME) -> Dict[str, Any]:
+    """
+    Parâmetros de create_table para o esquema v2 (usado pela migração, benchmark e setup local).
+
+    Args:
+        table_name: Nome da tabela
+
+    Returns:
+        Argumentos para DynamoDB.Client.create_table
+    """
+    return {
+        'TableName': table_name,
+        'AttributeDefinitions': [
+            {'AttributeName': 'AnalysisId', 'AttributeType': 'S'},
+            {'AttributeName': 'SuggestionKey', 'AttributeType': 'S'},
+            {'AttributeName': 'repo', 'AttributeType': 'S'},
+            {'AttributeName': 'StatusCreatedAt', 'AttributeType': 'S'},
+            {'AttributeName': 'RepoFile', 'AttributeType': 'S'},
+            {'AttributeName': 'created_at', 'AttributeType': 'S'},
+        ],
+        'KeySchema': [
+            {'AttributeName': 'AnalysisId', 'KeyType': 'HASH'},
+            {'AttributeName': 'SuggestionKey', 'KeyType': 'RANGE'},
+        ],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': 'RepoStatusIndex',
+                'KeySchema': [
+                    {'AttributeName': 'repo', 'KeyType': 'HASH'},
+                    {'AttributeName': 'StatusCreatedAt', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            },
+            {
+                'IndexName': 'RepoFileIndex',
+                'KeySchema': [
+                    {'AttributeName': 'RepoFile', 'KeyType': 'HASH'},
+                    {'AttributeName': 'created_at', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            },
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    }
+
+
+def relative_path(repo: str, file_path: str) -> str:
+    """
+    Caminho do arquivo relativo à raiz do repositório, estável entre análises.
+    """
+    prefix = repo.rstrip('/') + '/'
+    return file_path[len(prefix):] if file_path.startswith(prefix) else file_path
+
+
+class InvalidPageTokenError(ValueError):
+    """
+    Token de paginação que não foi gerado por encode_page_token.
+    """
+
+
+def encode_page_token(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Converte o LastEvaluatedKey do DynamoDB em um token opaco para a próxima página.
+    """
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, sort_keys=True).encode('utf-8')).decode('ascii')
+
+
+def decode_page_token(next_token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Restaura o ExclusiveStartKey a partir do token retornado na página anterior.
+
+    Raises:
+        InvalidPageTokenError: Se o token for inválido
+    """
+    if not next_token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(next_token.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidPageTokenError(f"Token de paginação inválido: {str(e)}") from e
+    if not isinstance(key, dict) or not all(isinstance(value, str) for value in key.values()):
+        raise InvalidPageTokenError("Token de paginação inválido")
+    return key
+
+
+def suggestion_id(analysis_id: str, analyzer: str, file_path: str, start_line: int, end_line: int, ordinal: int = 0) -> uuid.UUID:
+    """
+    ID determinístico de uma sugestão, para que a reentrega de uma mensagem regrave os mesmos itens
+    em vez de duplicá-los com novos IDs.
+
+    Args:
+        analysis_id: ID da análise
+        analyzer: Analisador que gerou a sugestão
+        file_path: Caminho do arquivo analisado
+        start_line: Linha inicial do trecho
+        end_line: Linha final do trecho
+        ordinal: Posição entre as sugestões do mesmo arquivo com o mesmo trecho
+
+    Returns:
+        UUID derivado (uuid5) dos campos acima
+    """
+    return uuid.uuid5(SUGGESTION_ID_NAMESPACE, f"{analysis_id}#{analyzer}#{file_path}#{int(start_line)}#{int(end_line)}#{ordinal}")
+
+
+def suggestion_key(file_path: str, start_line: int, suggestion_id: str) -> str:
+    # Linha com zeros à esquerda para que a ordenação lexicográfica siga a ordem das linhas
+    return f"{SUGGESTION_KEY_PREFIX}{file_path}#LINE#{int(start_line):08d}#{suggestion_id}"
+
+
+ANALYSIS_DONE_KEY = f"{DONE_KEY_PREFIX}ANALYSIS"
+
+
+def file_done_key(analyzer: str, file_path: str) -> str:
+    return f"{DONE_KEY_PREFIX}{analyzer}#FILE#{file_path}"
+
+
+class SuggestionStore:
+    """
+    Leitura e escrita de sugestões no esquema v2, incluindo compressão e overflow de trechos grandes.
+    """
+
+    def __init__(self, table, s3_client=None, overflow_bucket: Optional[str] = None):
+        self.table = table
+        self.s3_client = s3_client
+        self.overflow_bucket = overflow_bucket
+
+    def build_item(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Monta o item v2 a partir dos atributos de uma sugestão.
+
+        Args:
+            fields: Atributos no formato da tabela (AnalysisId, SuggestionId, FilePath, StartLine, repo, status,
+                created_at, OriginalSnippet, ModifiedCode, ...)
+
+        Returns:
+            Item pronto para put_item
+        """
+        item = {key: value for key, value in fields.items() if key not in SNIPPET_FIELDS}
+        item.setdefault('status', 'pending')
+        item.setdefault('created_at', datetime.now().isoformat())
+        item['SuggestionKey'] = suggestion_key(item['FilePath'], item['StartLine'], item['SuggestionId'])
+        item['StatusCreatedAt'] = f"{item['status']}#{item['created_at']}"
+        item['SchemaVersion'] = SCHEMA_VERSION
+
+        if item.get('repo'):
+            item['RepoFile'] = f"{item['repo']}#{relative_path(item['repo'], item['FilePath'])}"
+        else:
+            # Atributos de chave de GSI não podem ser string vazia
+            item.pop('repo', None)
+
+        for field in SNIPPET_FIELDS:
+            item.update(self._encode_snippet(field, fields.get(field) or '', item))
+        return item
+
+    def put(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        item = self.build_item(fields)
+        self.table.put_item(Item=item)
+        return item
+
+    def _encode_snippet(self, field: str, text: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        raw = text.encode('utf-8')
+        if len(raw) <= COMPRESS_THRESHOLD:
+            return {field: text}
+
+        compressed = zlib.compress(raw, 9)
+        if len(compressed) > OVERFLOW_THRESHOLD and self.overflow_bucket:
+            s3_key = f"suggestions/{item['AnalysisId']}/{item['SuggestionId']}/{field}.zz"
+            self.s3_client.put_object(Bucket=self.overflow_bucket, Key=s3_key, Body=compressed)
+            return {f"{field}Ref": f"s3://{self.overflow_bucket}/{s3_key}"}
+
+        return {f"{field}Z": compressed}
+
+    def _decode_snippet(self, field: str, item: Dict[str, Any]) -> str:
+        if field in item:
+            return item[field]
+        if f"{field}Z" in item:
+            return zlib.decompress(bytes(getattr(item[f"{field}Z"], 'value', item[f"{field}Z"]))).decode('utf-8')
+        if f"{field}Ref" in item:
+            bucket, s3_key = item[f"{field}Ref"][len('s3://'):].split('/', 1)
+            body = self.s3_client.get_object(Bucket=bucket, Key=s3_key)['Body'].read()
+            return zlib.decompress(body).decode('utf-8')
+        return ''
+
+    def decode_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Restaura os trechos de código de um item lido da tabela.
+
+        Args:
+            item: Item v2 lido do DynamoDB
+
+        Returns:
+            Item com OriginalSnippet e ModifiedCode em texto
+        """
+        encoded_fields = {f"{field}{suffix}" for field in SNIPPET_FIELDS for suffix in ('Z', 'Ref')}
+        decoded = {key: value for key, value in item.items() if key not in encoded_fields}
+        for field in SNIPPET_FIELDS:
+            decoded[field] = self._decode_snippet(field, item)
+        return decoded
+
+    def _query_all(self, **kwargs) -> List[Dict[str, Any]]:
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _query_page(self, limit: int, next_token: Optional[str], **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Lê uma única página da consulta.
+
+        Returns:
+            Tupla (itens decodificados, token da próxima página ou None na última)
+        """
+        kwargs['Limit'] = limit
+        start_key = decode_page_token(next_token)
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        response = self.table.query(**kwargs)
+        items = [self.decode_item(item) for item in response.get('Items', [])]
+        return items, encode_page_token(response.get('LastEvaluatedKey'))
+
+    def query_by_analysis(self, analysis_id: str, file_path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Sugestões de uma análise, ordenadas por arquivo e linha (opcionalmente de um único arquivo).
+        """
+        prefix = f"{SUGGESTION_KEY_PREFIX}{file_path}#" if file_path else SUGGESTION_KEY_PREFIX
+        condition = Key('AnalysisId').eq(analysis_id) & Key('SuggestionKey').begins_with(prefix)
+        return [self.decode_item(item) for item in self._query_all(KeyConditionExpression=condition)]
+
+    def mark_file_done(self, analysis_id: str, analyzer: str, file_path: str) -> None:
+        """
+        Registra que todas as sugestões de um arquivo da análise já foram gravadas.
+        """
+        self.table.put_item(Item={
+            'AnalysisId': analysis_id,
+            'SuggestionKey': file_done_key(analyzer, file_path),
+            'FilePath': file_path,
+            'Analyzer': analyzer,
+            'created_at': datetime.now().isoformat(),
+            'SchemaVersion': SCHEMA_VERSION,
+        })
+
+    def done_files(self, analysis_id: str, analyzer: str) -> Set[str]:
+        """
+        Arquivos da análise já concluídos pelo analisador (em uma entrega anterior da mensagem).
+        """
+        condition = Key('AnalysisId').eq(analysis_id) & Key('SuggestionKey').begins_with(file_done_key(analyzer, ''))
+        return {item['FilePath'] for item in self._query_all(KeyConditionExpression=condition, ProjectionExpression='FilePath')}
+
+    def mark_analysis_done(self, analysis_id: str) -> None:
+        """
+        Registra que todos os arquivos e analisadores da análise foram concluídos.
+        """
+        self.table.put_item(Item={
+            'AnalysisId': analysis_id,
+            'SuggestionKey': ANALYSIS_DONE_KEY,
+            'created_at': datetime.now().isoformat(),
+            'SchemaVersion': SCHEMA_VERSION,
+        })
+
+    def is_analysis_done(self, analysis_id: str) -> bool:
+        response = self.table.get_item(Key={'AnalysisId': analysis_id, 'SuggestionKey': ANALYSIS_DONE_KEY})
+        return 'Item' in response
+
+    def query_by_repo(self, repo: str, status: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, next_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Uma página das sugestões de um repositório em todas as análises, opcionalmente filtradas por status.
+
+        Returns:
+            Tupla (sugestões da página, token da próxima página ou None)
+        """
+        condition = Key('repo').eq(repo)
+        if status:
+            condition = condition & Key('StatusCreatedAt').begins_with(f"{status}#")
+        return self._query_page(limit, next_token, IndexName='RepoStatusIndex', KeyConditionExpression=condition)
+
+    def query_by_file(self, repo: str, file_path: str, status: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, next_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Uma página das sugestões de um arquivo do repositório em todas as análises, da mais antiga para a mais recente.
+        O filtro de status é aplicado após o Limit, então uma página pode vir com menos itens que o limite.
+
+        Returns:
+            Tupla (sugestões da página, token da próxima página ou None)
+        """
+        kwargs = {'KeyConditionExpression': Key('RepoFile').eq(f"{repo}#{relative_path(repo, file_path)}")}
+        if status:
+            kwargs['FilterExpression'] = Attr('status').eq(status)
+        return self._query_page(limit, next_token, IndexName='RepoFileIndex', **kwargs)
@@ -0,0 +1,140 @@
+"""
+Configuração de tracing distribuído (OpenTelemetry) para a API e o processador de análise.
+
+A API envia o contexto de trace nos atributos da mensagem SQS (inject_sqs_attributes) e o
+processador o restaura (extract_sqs_context), de forma que uma análise inteira
+(API -> SQS -> worker -> LLM -> DynamoDB) apareça como um único trace.
+
+Este módulo é compartilhado: a imagem da API copia este arquivo (ver api/Dockerfile).
+
+Variáveis de ambiente:
+    OTEL_TRACES_EXPORTER: otlp (padrão), console, file ou none
+    OTEL_EXPORTER_OTLP_ENDPOINT: endpoint do coletor OTLP/HTTP (ex: http://localhost:4318)
+    OTEL_TRACES_FILE: arquivo JSON Lines usado pelo exportador "file" (padrão: traces.jsonl)
+"""
+import os
+import json
+import logging
+import threading
+from typing import Dict, Any, Optional, Sequence
+from opentelemetry import trace, propagate
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider, ReadableSpan
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Exporta spans como JSON Lines em um arquivo local, para testes offline sem coletor.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            with self._lock, open(self.file_path, 'a', encoding='utf-8') as file:
+                for span in spans:
+                    file.write(json.dumps(json.loads(span.to_json())) + '\n')
+            return SpanExportResult.SUCCESS
+        except OSError as e:
+            logger.error(f"Erro ao exportar spans para {self.file_path}: {str(e)}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _build_exporter(exporter_name: str) -> Optional[SpanExporter]:
+    """
+    Cria o exportador de spans configurado.
+
+    Args:
+        exporter_name: Nome do exportador (otlp, console, file ou none)
+
+    Returns:
+        Exportador de spans ou None quando o tracing estiver desabilitado
+    """
+    if exporter_name == 'none':
+        return None
+    if exporter_name == 'console':
+        return ConsoleSpanExporter()
+    if exporter_name == 'file':
+        return FileSpanExporter(os.getenv('OTEL_TRACES_FILE', 'traces.jsonl'))
+    if exporter_name == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+
+    raise ValueError(f"OTEL_TRACES_EXPORTER inválido: {exporter_name}")
+
+
+def setup_tracing(service_name: str) -> None:
+    """
+    Configura o TracerProvider global do processo.
+
+    Args:
+        service_name: Nome do serviço reportado nos spans
+    """
+    exporter = _build_exporter(os.getenv('OTEL_TRACES_EXPORTER', 'otlp').lower())
+    provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+
+    if exporter is not None:
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing configurado para {service_name} (exportador: {os.getenv('OTEL_TRACES_EXPORTER', 'otlp')})")
+
+
+def shutdown_tracing() -> None:
+    """
+    Envia os spans pendentes antes de encerrar o processo.
+    """
+    provider = trace.get_tracer_provider()
+    if isinstance(provider, TracerProvider):
+        provider.shutdown()
+
+
+def inject_sqs_attributes(message_attributes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Adiciona o contexto de trace atual aos atributos de uma mensagem SQS.
+
+    Args:
+        message_attributes: Atributos já existentes da mensagem (opcional)
+
+    Returns:
+        Atributos da mensagem incluindo traceparent/tracestate
+    """
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+
+    attributes = dict(message_attributes or {})
+    for key, value in carrier.items():
+        attributes[key] = {'DataType': 'String', 'StringValue': value}
+    return attributes
+
+
+def extract_sqs_context(message_attributes: Optional[Dict[str, Any]]) -> Context:
+    """
+    Restaura o contexto de trace a partir dos atributos de uma mensagem SQS.
+
+    Args:
+        message_attributes: Atributos da mensagem recebida (MessageAttributes)
+
+    Returns:
+        Contexto do trace de origem, ou contexto vazio se não houver propagação
+    """
+    carrier = {
+        key: value['StringValue']
+        for key, value in (message_attributes or {}).items()
+        if isinstance(value, dict) and 'StringValue' in value
+    }
+    return propagate.extract(carrier)
@@ -0,0 +1,26 @@
+"""
+Configuração compartilhada dos testes (executar a partir de agents/java-migrate: python -m pytest tests).
+"""
+import os
+import sys
+
+# Os módulos do processador são importados pelo nome, como em main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from moto import mock_aws
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """
+    AWS simulada pelo moto. Os módulos chamam load_dotenv() ao serem importados, então o endpoint do
+    LocalStack vindo do .env (AWS_ENDPOINT_URL) é removido para que as chamadas não saiam do processo.
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    with mock_aws():
+        yield
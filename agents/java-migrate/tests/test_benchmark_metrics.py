@@ -0,0 +1,24 @@
+import pytest
+
+from benchmark.run import percentile
+
+
+def test_percentile_empty():
+    assert percentile([], 95) is None
+
+
+@pytest.mark.parametrize("pct, expected", [(50, 50), (95, 95), (99, 99), (100, 100)])
+def test_percentile_nearest_rank(pct, expected):
+    assert percentile(list(range(1, 101)), pct) == expected
+
+
+def test_percentile_small_sample_does_not_return_max():
+    values = list(range(1, 21))
+    assert percentile(values, 95) == 19
+    assert percentile(values, 99) == 20
+
+
+def test_percentile_unsorted_and_single_value():
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([7.0], 1) == 7.0
+    assert percentile([7.0], 0) == 7.0
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage, SystemMessage
+
+from main import LangChainAgent, Suggestion, get_format_instructions
+from prompts.java_migration_prompt import system_prompt
+
+SUGGESTION = {
+    "file_path": "src/Main.java",
+    "description": "Usar var",
+    "start_line": 3,
+    "end_line": 3,
+    "original_snippet": 'String s = "a";',
+    "modified_code": 'var s = "a";',
+    "difficulty_level": 1,
+    "last": True,
+    "analyzer": "java8to21",
+}
+
+
+@pytest.fixture(autouse=True)
+def llm_env(monkeypatch):
+    for name in ("GEMINI_CACHED_CONTENT", "GEMINI_CACHE_MIN_TOKENS", "LLM_FIXTURE_MODE", "PROMPT_SCHEMA_MODE", "LLM_FIXUP_ATTEMPTS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def make_agent(responses, **kwargs):
+    llm = FakeListChatModel(responses=responses)
+    return LangChainAgent(prompt_template=system_prompt, llm=llm, **kwargs), llm
+
+
+@pytest.mark.parametrize("raw_output", ['{}', '[]', json.dumps({"sugestoes": [SUGGESTION]})])
+def test_missing_suggestions_key_is_sent_to_fixup(raw_output):
+    agent, llm = make_agent([raw_output, json.dumps({"suggestions": [SUGGESTION]})])
+
+    result = agent.generate_suggestions("class Main {}", "src/Main.java")
+
+    assert [suggestion.description for suggestion in result.suggestions] == ["Usar var"]
+    assert llm.i == 0  # as duas respostas foram consumidas: original e correção
+
+
+def test_missing_suggestions_key_raises_when_fixup_fails():
+    agent, _ = make_agent(['{}', '{"resultado": []}'])
+
+    with pytest.raises(OutputParserException):
+        agent.generate_suggestions("class Main {}", "src/Main.java")
+
+
+def test_empty_suggestions_list_is_valid():
+    agent, _ = make_agent(['{"suggestions": []}'])
+    assert agent.generate_suggestions("class Main {}", "src/Main.java").suggestions == []
+
+
+def test_file_path_comes_from_the_analyzed_file():
+    echoed = {**SUGGESTION, "file_path": "Main.java"}
+    agent, _ = make_agent([json.dumps({"suggestions": [echoed]})])
+
+    result = agent.generate_suggestions("class Main {}", "/repos/app/src/Main.java")
+
+    assert [suggestion.file_path for suggestion in result.suggestions] == ["/repos/app/src/Main.java"]
+
+
+def test_compact_format_instructions_list_every_field_except_id():
+    compact = get_format_instructions("compact")
+
+    for name in Suggestion.model_fields:
+        assert (f'"{name}":' in compact) == (name != "id")
+    assert '"analyzer": "java8to21"|"simpler3to4"' in compact
+    assert '"additional_notes": string|null' in compact
+    assert len(compact) < len(get_format_instructions("full")) / 2
+
+
+def test_invalid_schema_mode_raises():
+    with pytest.raises(ValueError):
+        get_format_instructions("verbose")
+
+
+def usage_model(input_tokens, cache_read):
+    message = AIMessage(
+        content=json.dumps({"suggestions": [SUGGESTION]}),
+        usage_metadata={"input_tokens": input_tokens, "output_tokens": 10, "total_tokens": input_tokens + 10,
+                        "input_token_details": {"cache_read": cache_read}},
+    )
+    return GenericFakeChatModel(messages=iter([message]))
+
+
+def test_token_report_counts_sent_prefix_without_cached_content():
+    llm = usage_model(1500, 1024)
+    agent = LangChainAgent(prompt_template=system_prompt, llm=llm)
+
+    agent.generate_suggestions("class Main {}", "src/Main.java")
+    report = agent.token_report()
+
+    assert report["calls"] == 1
+    assert report["prefix_tokens"] == agent.prefix_tokens
+    assert report["cached_prefix_tokens"] == 0
+    assert report["input_tokens"] == 1500
+    assert report["cached_tokens"] == 1024
+    assert report["prefix_share"] == round(agent.prefix_tokens / (agent.prefix_tokens + report["file_tokens"]), 3)
+    assert report["prefix_cache_eligible"] is (agent.prefix_tokens >= 1024)
+
+
+def test_token_report_moves_prefix_to_cached_with_cached_content(monkeypatch):
+    monkeypatch.setenv("GEMINI_CACHED_CONTENT", "cachedContents/prefixo")
+    sent = []
+    llm = usage_model(300, 0)
+    agent = LangChainAgent(prompt_template=system_prompt, llm=llm)
+    monkeypatch.setattr(agent, "_invoke_llm", lambda messages: sent.append(messages) or llm.invoke(messages))
+
+    agent.generate_suggestions("class Main {}", "src/Main.java")
+    report = agent.token_report()
+
+    assert not any(isinstance(message, SystemMessage) for message in sent[0])
+    assert report["prefix_tokens"] == 0
+    assert report["cached_prefix_tokens"] == agent.prefix_tokens
+    assert report["prefix_share"] == 0.0
+
+
+def test_prefix_below_cache_minimum_is_reported(monkeypatch):
+    monkeypatch.setenv("GEMINI_CACHE_MIN_TOKENS", "100000")
+    agent, _ = make_agent(['{"suggestions": []}'], schema_mode="compact")
+    assert agent.token_report()["prefix_cache_eligible"] is False
+
+    monkeypatch.setenv("GEMINI_CACHE_MIN_TOKENS", "1")
+    agent, _ = make_agent(['{"suggestions": []}'], schema_mode="compact")
+    assert agent.token_report()["prefix_cache_eligible"] is True
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import main
+from benchmark.fake_llm import FakeGeminiChatModel
+from llm_fixtures import LLMFixtureStore, FixtureNotFoundError
+from prompts.java_migration_prompt import system_prompt
+
+CODE_TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code_tests")
+
+
+def test_record_is_kept_in_memory_until_flush(tmp_path):
+    path = str(tmp_path / "fixtures" / "responses.json.gz")
+    store = LLMFixtureStore(path)
+
+    store.record("prompt", '{"suggestions": []}', 0.1234)
+    assert store.replay("prompt") == '{"suggestions": []}'
+    assert not os.path.exists(path)
+
+    store.flush()
+    reloaded = LLMFixtureStore(path)
+    assert len(reloaded) == 1
+    assert reloaded.replay("prompt") == '{"suggestions": []}'
+
+
+def test_flush_without_changes_does_not_write(tmp_path):
+    path = str(tmp_path / "responses.json.gz")
+    LLMFixtureStore(path).flush()
+    assert not os.path.exists(path)
+
+
+def test_replay_unknown_prompt_raises(tmp_path):
+    store = LLMFixtureStore(str(tmp_path / "responses.json.gz"))
+    with pytest.raises(FixtureNotFoundError):
+        store.replay("desconhecido")
+
+
+def load_corpus():
+    corpus = {}
+    for file_name in sorted(os.listdir(CODE_TESTS_DIR)):
+        if file_name.endswith(".java"):
+            with open(os.path.join(CODE_TESTS_DIR, file_name), encoding="utf-8") as file:
+                corpus[os.path.join("code_tests", file_name)] = file.read()
+    return corpus
+
+
+def test_agent_replays_recorded_corpus_without_gemini(tmp_path, monkeypatch):
+    for name in ("GEMINI_CACHED_CONTENT", "LLM_FIXTURE_REPLAY_LATENCY", "PROMPT_SCHEMA_MODE"):
+        monkeypatch.delenv(name, raising=False)
+    path = str(tmp_path / "responses.json.gz")
+    corpus = load_corpus()
+    assert corpus
+
+    recorder = main.LangChainAgent(
+        prompt_template=system_prompt,
+        llm=FakeGeminiChatModel(latency=0, jitter=0),
+        fixture_mode="record",
+        fixture_path=path,
+    )
+    recorded = {file_path: recorder.generate_suggestions(code, file_path) for file_path, code in corpus.items()}
+    recorder.fixture_store.flush()
+
+    def no_gemini(*args, **kwargs):
+        raise AssertionError("O replay não deve criar o cliente do Gemini")
+
+    monkeypatch.setattr(main, "ChatGoogleGenerativeAI", no_gemini)
+    player = main.LangChainAgent(prompt_template=system_prompt, llm=None, fixture_mode="replay", fixture_path=path)
+
+    assert player.llm is None
+    for file_path, code in corpus.items():
+        assert player.generate_suggestions(code, file_path) == recorded[file_path]
+    assert any(result.suggestions for result in recorded.values())
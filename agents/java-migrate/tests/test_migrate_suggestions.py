@@ -0,0 +1,63 @@
+import random
+import string
+
+import boto3
+import pytest
+
+import migrate_suggestions
+from suggestion_store import SuggestionStore
+
+TARGET_TABLE = "CodeSuggestionsV2-test"
+_rng = random.Random(1)
+LARGE_SNIPPET = "".join(_rng.choice(string.ascii_letters) for _ in range(120 * 1024))
+
+
+@pytest.fixture
+def legacy_table(aws):
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+    table = dynamodb.create_table(
+        TableName="CodeSuggestions",
+        AttributeDefinitions=[
+            {"AttributeName": "AnalysisId", "AttributeType": "S"},
+            {"AttributeName": "SuggestionId", "AttributeType": "S"},
+        ],
+        KeySchema=[
+            {"AttributeName": "AnalysisId", "KeyType": "HASH"},
+            {"AttributeName": "SuggestionId", "KeyType": "RANGE"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="overflow-bucket")
+
+    for index in range(10):
+        table.put_item(Item={
+            "AnalysisId": f"analysis-{index % 3}",
+            "SuggestionId": f"s{index}",
+            "FilePath": "/repos/app/A.java",
+            "StartLine": index,
+            "OriginalSnippet": LARGE_SNIPPET if index == 0 else "int x = 1;",
+            "ModifiedCode": "var x = 1;",
+            "repo": "/repos/app",
+        })
+
+
+def overflow_objects():
+    return boto3.client("s3", region_name="us-east-1").list_objects_v2(Bucket="overflow-bucket").get("KeyCount", 0)
+
+
+def test_dry_run_writes_nothing(legacy_table):
+    migrate_suggestions.main(["--dry-run", "--target-table", TARGET_TABLE, "--overflow-bucket", "overflow-bucket", "--segments", "3"])
+    assert overflow_objects() == 0
+    assert TARGET_TABLE not in boto3.client("dynamodb", region_name="us-east-1").list_tables()["TableNames"]
+
+
+def test_migration_copies_every_item(legacy_table):
+    migrate_suggestions.main(["--create-table", "--target-table", TARGET_TABLE, "--overflow-bucket", "overflow-bucket", "--segments", "3"])
+    assert overflow_objects() == 1
+
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+    store = SuggestionStore(dynamodb.Table(TARGET_TABLE), s3_client=boto3.client("s3", region_name="us-east-1"))
+    migrated = [item for index in range(3) for item in store.query_by_analysis(f"analysis-{index}")]
+    assert sorted(item["SuggestionId"] for item in migrated) == sorted(f"s{index}" for index in range(10))
+    assert all(item["status"] == "pending" for item in migrated)
+    assert next(item for item in migrated if item["SuggestionId"] == "s0")["OriginalSnippet"] == LARGE_SNIPPET
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from pydantic import BaseModel
+
+from output_repair import repair_json, salvage_items
+
+
+class Item(BaseModel):
+    name: str
+    line: int
+
+
+def test_repair_json_valid_input_is_unchanged():
+    assert repair_json('{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_repair_json_strips_code_fence_and_trailing_commas():
+    text = '```json\n{"suggestions": [{"name": "a", "line": 1},],}\n```'
+    assert repair_json(text) == {"suggestions": [{"name": "a", "line": 1}]}
+
+
+def test_repair_json_keeps_trailing_commas_inside_strings():
+    snippet = "int[] a = {1, 2,};\nenum Cor { AZUL, VERDE, }"
+    text = json.dumps({"original_snippet": snippet, "values": [1, 2]})[:-1] + ",}"
+    assert repair_json(text) == {"original_snippet": snippet, "values": [1, 2]}
+
+
+def test_repair_json_handles_escaped_quotes_in_strings():
+    text = '{"code": "String s = \\"a,]\\";", "n": 1,}'
+    assert repair_json(text) == {"code": 'String s = "a,]";', "n": 1}
+
+
+def test_repair_json_closes_truncated_output_keeping_complete_items():
+    full = json.dumps({"suggestions": [{"name": "a", "line": 1}, {"name": "b", "line": 2}]})
+    truncated = full[:full.rfind('"line"')]
+    data = repair_json(truncated)
+    assert data["suggestions"][0] == {"name": "a", "line": 1}
+    assert data["suggestions"][1] == {"name": "b"}
+
+
+def test_repair_json_ignores_text_around_json():
+    assert repair_json('Aqui está: {"a": 1} espero ter ajudado') == {"a": 1}
+
+
+def test_repair_json_raises_without_json():
+    with pytest.raises(ValueError):
+        repair_json("nenhuma sugestão")
+
+
+def test_salvage_items_keeps_valid_items():
+    data = {"suggestions": [{"name": "a", "line": 1}, {"name": "b"}, {"name": "c", "line": 3}]}
+    valid, invalid = salvage_items(data, Item)
+    assert [item.name for item in valid] == ["a", "c"]
+    assert len(invalid) == 1
+    assert invalid[0][0] == {"name": "b"}
+    assert "line" in invalid[0][1]
+
+
+def test_salvage_items_accepts_bare_list():
+    valid, invalid = salvage_items([{"name": "a", "line": 1}], Item)
+    assert len(valid) == 1 and invalid == []
+
+
+@pytest.mark.parametrize("data", [
+    {},
+    [],
+    {"sugestoes": [{"name": "a", "line": 1}]},
+    {"suggestions": "nada"},
+    {"suggestions": None},
+])
+def test_salvage_items_rejects_missing_list(data):
+    with pytest.raises(ValueError, match="suggestions"):
+        salvage_items(data, Item)
+
+
+def test_salvage_items_accepts_empty_suggestions():
+    assert salvage_items({"suggestions": []}, Item) == ([], [])
@@ -0,0 +1,133 @@
+import boto3
+import pytest
+
+from similarity_index import SimilarityIndex, compute_fingerprint, normalize_tokens, remap_suggestions, table_definition
+
+SOURCE = """package app;
+
+public class Original {
+    public String greet(String name) {
+        String message = "Hello, " + name;
+        return message;
+    }
+
+    public int total(int[] values) {
+        int sum = 0;
+        for (int value : values) {
+            sum += value;
+        }
+        return sum;
+    }
+}
+"""
+
+SUGGESTIONS = [
+    {
+        "file_path": "src/Original.java",
+        "description": "Usar var em Original.greet",
+        "start_line": 5,
+        "end_line": 5,
+        "original_snippet": 'String message = "Hello, " + name;',
+        "modified_code": 'var message = "Hello, " + name;',
+        "difficulty_level": 1,
+        "analyzer": "java8to21",
+    },
+    {
+        "file_path": "src/Original.java",
+        "description": "Usar stream",
+        "start_line": 10,
+        "end_line": 14,
+        "original_snippet": "int sum = 0; ...",
+        "modified_code": "return IntStream.of(values).sum();",
+        "difficulty_level": 2,
+        "analyzer": "java8to21",
+    },
+]
+
+
+def renamed(source, name="Copy"):
+    return source.replace("Original", name)
+
+
+def test_normalize_tokens_ignores_comments_literals_and_type_name():
+    tokens = normalize_tokens('class A { /* x */ String s = "a"; // y\n int n = 42; }', type_name="A")
+    assert tokens == ["class", "TYPE", "{", "String", "s", "=", "STR", ";", "int", "n", "=", "NUM", ";", "}"]
+
+
+def test_fingerprint_is_deterministic_and_rename_invariant():
+    original = compute_fingerprint(SOURCE, "src/Original.java")
+    copy = compute_fingerprint("// cópia\n" + renamed(SOURCE).replace('"Hello, "', '"Olá, "'), "other/Copy.java")
+    assert original == compute_fingerprint(SOURCE, "src/Original.java")
+    assert copy.content_hash == original.content_hash
+    assert copy.similarity(original.signature) == 1.0
+    assert len(original.bands()) == 16
+
+
+def test_fingerprint_similarity_drops_with_changes():
+    original = compute_fingerprint(SOURCE, "src/Original.java")
+    changed = SOURCE.replace("sum += value;", "sum = Math.addExact(sum, value);\n            log(sum);")
+    unrelated = "class Other { void run() { System.out.println(1); } }"
+    near = original.similarity(compute_fingerprint(changed, "src/Original.java").signature)
+    far = original.similarity(compute_fingerprint(unrelated, "src/Other.java").signature)
+    assert far < near < 1.0
+
+
+def test_remap_shifts_lines_and_renames_type():
+    new_source = "// Copyright\n\n" + renamed(SOURCE)
+    remapped = remap_suggestions(SOURCE, new_source, SUGGESTIONS, "other/Copy.java", "src/Original.java")
+    assert [(s["start_line"], s["end_line"]) for s in remapped] == [(7, 7), (12, 16)]
+    assert all(s["file_path"] == "other/Copy.java" for s in remapped)
+    assert remapped[0]["description"] == "Usar var em Copy.greet"
+    assert SUGGESTIONS[0]["start_line"] == 5
+
+
+def test_remap_allows_removed_code_outside_suggestions():
+    new_source = SOURCE.replace("        return message;\n", "")
+    remapped = remap_suggestions(SOURCE, new_source, SUGGESTIONS, "src/Original.java", "src/Original.java")
+    assert [(s["start_line"], s["end_line"]) for s in remapped] == [(5, 5), (9, 13)]
+
+
+@pytest.mark.parametrize("new_source", [
+    SOURCE.replace("    public int total", "    public void extra() {\n        System.exit(0);\n    }\n\n    public int total"),
+    SOURCE.replace("return message;", "return message.trim();"),
+    SOURCE.replace("    public String greet", '    String url = "http://example.com";\n    public String greet'),
+])
+def test_remap_rejects_added_or_changed_code(new_source):
+    assert remap_suggestions(SOURCE, new_source, SUGGESTIONS, "src/Original.java", "src/Original.java") is None
+
+
+def test_remap_rejects_when_suggested_snippet_changed():
+    new_source = SOURCE.replace("sum += value;", "")
+    assert remap_suggestions(SOURCE, new_source, SUGGESTIONS, "src/Original.java", "src/Original.java") is None
+
+
+def test_remap_ignores_added_comments():
+    new_source = SOURCE.replace("    public int total", "    /**\n     * Soma os valores.\n     */\n    public int total")
+    remapped = remap_suggestions(SOURCE, new_source, SUGGESTIONS, "src/Original.java", "src/Original.java")
+    assert [(s["start_line"], s["end_line"]) for s in remapped] == [(5, 5), (13, 17)]
+
+
+@pytest.fixture
+def index(aws):
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+    dynamodb.meta.client.create_table(**table_definition("Fingerprints"))
+    return SimilarityIndex(dynamodb.Table("Fingerprints"), threshold=0.9)
+
+
+def test_index_reuses_suggestions_for_copy(index):
+    index.add(SOURCE, "src/Original.java", "java8to21", "analysis-1", SUGGESTIONS)
+
+    match = index.find_reusable("\n" + renamed(SOURCE), "other/Copy.java", "java8to21")
+    assert match is not None
+    suggestions, similarity = match
+    assert similarity == 1.0
+    assert [s["start_line"] for s in suggestions] == [6, 11]
+
+
+def test_index_requires_same_analyzer_and_no_new_code(index):
+    index.add(SOURCE, "src/Original.java", "java8to21", "analysis-1", SUGGESTIONS)
+
+    assert index.find_reusable(SOURCE, "src/Original.java", "simpler3to4") is None
+    changed = SOURCE.replace("return sum;", "return sum * 2;")
+    assert index.find_reusable(changed, "src/Original.java", "java8to21") is None
+    assert index.find_reusable("class Other {}", "src/Other.java", "java8to21") is None
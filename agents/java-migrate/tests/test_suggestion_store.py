@@ -0,0 +1,162 @@
+import random
+import string
+
+import boto3
+import pytest
+
+from suggestion_store import (
+    SuggestionStore, InvalidPageTokenError, table_definition, suggestion_key, suggestion_id, relative_path,
+    decode_page_token, COMPRESS_THRESHOLD,
+)
+
+REPO = "/repos/app"
+
+
+@pytest.fixture
+def store(aws):
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+    dynamodb.meta.client.create_table(**table_definition("Suggestions"))
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="overflow-bucket")
+    return SuggestionStore(dynamodb.Table("Suggestions"), s3_client=s3, overflow_bucket="overflow-bucket")
+
+
+def fields(suggestion_id, start_line, file_path=f"{REPO}/src/A.java", analysis_id="analysis-1", status="pending", **extra):
+    return {
+        "AnalysisId": analysis_id,
+        "SuggestionId": suggestion_id,
+        "FilePath": file_path,
+        "StartLine": start_line,
+        "EndLine": start_line,
+        "OriginalSnippet": "int x = 1;",
+        "ModifiedCode": "var x = 1;",
+        "repo": REPO,
+        "status": status,
+        "created_at": f"2026-01-01T00:00:{start_line:02d}",
+        **extra,
+    }
+
+
+def test_suggestion_key_orders_lines_numerically():
+    keys = [suggestion_key("A.java", line, "id") for line in (10, 9, 100)]
+    assert sorted(keys) == [suggestion_key("A.java", line, "id") for line in (9, 10, 100)]
+
+
+def test_suggestion_id_is_deterministic():
+    first = suggestion_id("analysis-1", "java8to21", "A.java", 3, 4)
+    assert first == suggestion_id("analysis-1", "java8to21", "A.java", 3, 4)
+    assert first != suggestion_id("analysis-1", "java8to21", "A.java", 3, 4, ordinal=1)
+    assert first != suggestion_id("analysis-2", "java8to21", "A.java", 3, 4)
+
+
+def test_relative_path_strips_repo_prefix():
+    assert relative_path(REPO, f"{REPO}/src/A.java") == "src/A.java"
+    assert relative_path(REPO + "/", f"{REPO}/src/A.java") == "src/A.java"
+    assert relative_path(REPO, "/outro/A.java") == "/outro/A.java"
+
+
+def test_build_item_sets_v2_keys(aws):
+    item = SuggestionStore(table=None).build_item(fields("s1", 7))
+    assert item["SuggestionKey"] == f"FILE#{REPO}/src/A.java#LINE#00000007#s1"
+    assert item["StatusCreatedAt"] == "pending#2026-01-01T00:00:07"
+    assert item["RepoFile"] == f"{REPO}#src/A.java"
+    assert item["SchemaVersion"] == 2
+    assert item["OriginalSnippet"] == "int x = 1;"
+
+
+def test_build_item_drops_empty_repo(aws):
+    item = SuggestionStore(table=None).build_item(fields("s1", 1, repo=""))
+    assert "repo" not in item and "RepoFile" not in item
+
+
+def test_large_snippet_is_compressed_and_restored(store):
+    snippet = "String s = \"valor\";\n" * 200
+    item = store.put(fields("s1", 1, OriginalSnippet=snippet))
+    assert "OriginalSnippet" not in item
+    assert len(item["OriginalSnippetZ"]) < COMPRESS_THRESHOLD
+
+    [decoded] = store.query_by_analysis("analysis-1")
+    assert decoded["OriginalSnippet"] == snippet
+    assert decoded["ModifiedCode"] == "var x = 1;"
+    assert "OriginalSnippetZ" not in decoded
+
+
+def test_incompressible_snippet_overflows_to_s3(store):
+    rng = random.Random(1)
+    snippet = "".join(rng.choice(string.ascii_letters) for _ in range(120 * 1024))
+    item = store.put(fields("s1", 1, ModifiedCode=snippet))
+    assert item["ModifiedCodeRef"].startswith("s3://overflow-bucket/suggestions/analysis-1/s1/")
+
+    [decoded] = store.query_by_analysis("analysis-1")
+    assert decoded["ModifiedCode"] == snippet
+
+
+def test_query_by_analysis_orders_by_file_and_line(store):
+    for suggestion_id, line in (("c", 30), ("a", 2), ("b", 10)):
+        store.put(fields(suggestion_id, line))
+    store.put(fields("other", 1, file_path=f"{REPO}/src/B.java"))
+
+    items = store.query_by_analysis("analysis-1", file_path=f"{REPO}/src/A.java")
+    assert [item["SuggestionId"] for item in items] == ["a", "b", "c"]
+
+
+def test_query_by_repo_is_paginated(store):
+    for line in range(1, 6):
+        store.put(fields(f"s{line}", line, analysis_id=f"analysis-{line}"))
+    store.put(fields("done", 9, status="approved"))
+
+    seen, next_token = [], None
+    while True:
+        items, next_token = store.query_by_repo(REPO, status="pending", limit=2, next_token=next_token)
+        assert len(items) <= 2
+        seen.extend(item["SuggestionId"] for item in items)
+        if not next_token:
+            break
+    assert seen == ["s1", "s2", "s3", "s4", "s5"]
+
+
+def test_query_by_file_filters_status_across_analyses(store):
+    store.put(fields("old", 1, analysis_id="analysis-1", status="rejected"))
+    store.put(fields("new", 2, analysis_id="analysis-2"))
+
+    items, next_token = store.query_by_file(REPO, "src/A.java", status="pending")
+    assert [item["SuggestionId"] for item in items] == ["new"]
+    assert next_token is None
+
+
+@pytest.mark.parametrize("token", ["não-é-base64", "bnVsbA==", "WzEsIDJd"])
+def test_invalid_page_token(token):
+    with pytest.raises(InvalidPageTokenError):
+        decode_page_token(token)
+
+
+def test_redelivered_suggestion_overwrites_same_item(store):
+    item_id = str(suggestion_id("analysis-1", "java8to21", f"{REPO}/src/A.java", 3, 3))
+    store.put(fields(item_id, 3))
+    store.put(fields(item_id, 3, created_at="2026-01-02T00:00:00"))
+
+    assert len(store.query_by_analysis("analysis-1")) == 1
+
+
+def test_done_files_are_hidden_from_suggestion_queries(store):
+    store.put(fields("s1", 3))
+    store.mark_file_done("analysis-1", "java8to21", f"{REPO}/src/A.java")
+
+    assert store.done_files("analysis-1", "java8to21") == {f"{REPO}/src/A.java"}
+    assert store.done_files("analysis-1", "simpler3to4") == set()
+    assert store.done_files("analysis-2", "java8to21") == set()
+    assert [item["SuggestionId"] for item in store.query_by_analysis("analysis-1")] == ["s1"]
+    items, _ = store.query_by_repo(REPO)
+    assert [item["SuggestionId"] for item in items] == ["s1"]
+
+
+def test_analysis_done_marker(store):
+    store.put(fields("s1", 3))
+    assert not store.is_analysis_done("analysis-1")
+
+    store.mark_analysis_done("analysis-1")
+
+    assert store.is_analysis_done("analysis-1")
+    assert not store.is_analysis_done("analysis-2")
+    assert store.done_files("analysis-1", "java8to21") == set()
+    assert [item["SuggestionId"] for item in store.query_by_analysis("analysis-1")] == ["s1"]
@@ -0,0 +1,50 @@
+import json
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from telemetry import FileSpanExporter, inject_sqs_attributes, extract_sqs_context
+
+tracer = TracerProvider().get_tracer(__name__)
+
+
+def test_sqs_attributes_round_trip_keeps_trace_id():
+    existing = {"Origem": {"DataType": "String", "StringValue": "api"}}
+    with tracer.start_as_current_span("post_analyze") as producer:
+        attributes = inject_sqs_attributes(existing)
+
+    assert attributes["Origem"] == existing["Origem"]
+    assert attributes["traceparent"]["DataType"] == "String"
+
+    context = extract_sqs_context(attributes)
+    with tracer.start_as_current_span("process_code_analysis_request", context=context) as consumer:
+        pass
+
+    assert consumer.get_span_context().trace_id == producer.get_span_context().trace_id
+    assert consumer.parent.span_id == producer.get_span_context().span_id
+
+
+def test_extract_without_propagation_returns_empty_context():
+    for message_attributes in (None, {}, {"Origem": {"DataType": "Binary", "BinaryValue": b"x"}}):
+        span = trace.get_current_span(extract_sqs_context(message_attributes))
+        assert not span.get_span_context().is_valid
+
+
+def test_file_span_exporter_writes_one_json_line_per_span(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(FileSpanExporter(str(path))))
+    file_tracer = provider.get_tracer(__name__)
+
+    with file_tracer.start_as_current_span("pai"):
+        with file_tracer.start_as_current_span("filho"):
+            pass
+    with file_tracer.start_as_current_span("outro"):
+        pass
+    provider.shutdown()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    spans = [json.loads(line) for line in lines]
+    assert [span["name"] for span in spans] == ["filho", "pai", "outro"]
+    assert spans[0]["context"]["trace_id"] == spans[1]["context"]["trace_id"]
@@ -1,22 +1,35 @@
 import boto3
 import os
-from fastapi import FastAPI, HTTPException
+import logging
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
 from uuid import UUID
 from enum import Enum
 from typing import Optional, List
-from boto3.dynamodb.conditions import Key
 from dotenv import load_dotenv
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+from telemetry import setup_tracing, shutdown_tracing, inject_sqs_attributes
+from suggestion_store import SuggestionStore, InvalidPageTokenError, DEFAULT_TABLE_NAME, DEFAULT_PAGE_SIZE
 
 import traceback
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 #print("Variáveis carregadas:", os.environ)
 
+setup_tracing(os.getenv('OTEL_SERVICE_NAME', 'java-migrate-api'))
+tracer = trace.get_tracer(__name__)
+
 app = FastAPI()
 
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_tracing()
+
 class AnalyzerEnum(str, Enum):
     JAVA8_TO_21 = "java8to21"
     SIMPLER_3_TO_4 = "simpler3to4"
@@ -40,70 +53,112 @@ class Suggestion(BaseModel):
     last: bool = False
     analyzer: AnalyzerEnum
     additional_notes: Optional[str] = None
+    status: Optional[str] = None
 
 class SuggestionsListOutput(BaseModel):
     id: UUID
     completed: bool = False
     suggestions: List[Suggestion]
 
+class SuggestionsPage(BaseModel):
+    suggestions: List[Suggestion]
+    next_token: Optional[str] = None
+
 sqs_client = boto3.client("sqs", region_name="us-east-1" )  # Substitua pela região correta
 QUEUE_URL = os.getenv("SQS_QUEUE_URL", "http://localhost:4566/000000000000/your-queue-name")
 
 dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('CodeSuggestions')
+table = dynamodb.Table(os.getenv('DYNAMODB_SUGGESTIONS_TABLE', DEFAULT_TABLE_NAME))
+# O S3 só é necessário para ler trechos movidos para o bucket de overflow
+suggestion_store = SuggestionStore(table, s3_client=boto3.client('s3'), overflow_bucket=os.getenv('SUGGESTIONS_OVERFLOW_BUCKET'))
+
+def item_to_suggestion(item: dict) -> Suggestion:
+    return Suggestion(
+        id=item['SuggestionId'],
+        analyzer_id=item['AnalysisId'],
+        file_path=item['FilePath'],
+        analyzer=AnalyzerEnum(item['Analyzer']),
+        description=item['Description'],
+        start_line=int(item['StartLine']),
+        end_line=int(item['EndLine']),
+        original_snippet=item['OriginalSnippet'],
+        modified_code=item['ModifiedCode'],
+        difficulty_level=int(item['DifficultyLevel']),
+        additional_notes=item.get('AdditionalNotes'),
+        last= bool(item['Last']) if 'Last' in item else False,
+        status=item.get('status')
+    )
 
 @app.post("/analyze") # retornar 202 Accepted
 def post_analyze(input_data: AnalyzeInput):
-    try:
-        message_body = input_data.model_dump_json()
-        response = sqs_client.send_message(
-            QueueUrl=QUEUE_URL,
-            MessageBody=message_body
-        )
-        return {
-            "message_id": response["MessageId"],
-            "status": "Message sent to SQS successfully"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with tracer.start_as_current_span("post_analyze", kind=SpanKind.SERVER) as span:
+        span.set_attribute('analysis.repo', input_data.repo)
+        try:
+            message_body = input_data.model_dump_json()
+            with tracer.start_as_current_span("sqs.send_message", kind=SpanKind.PRODUCER):
+                # O contexto de trace segue nos atributos da mensagem até o processador
+                response = sqs_client.send_message(
+                    QueueUrl=QUEUE_URL,
+                    MessageBody=message_body,
+                    MessageAttributes=inject_sqs_attributes()
+                )
+            return {
+                "message_id": response["MessageId"],
+                "status": "Message sent to SQS successfully"
+            }
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
     
 
 @app.get("/analyze/{analyze_id}", response_model=SuggestionsListOutput) # caso nao tenha analise 204 No Content, caso tenha mas ainda nao concluida 102 Processing.
 def get_analyze(analyze_id: str):
     try:
 
-        response = table.query(
-            KeyConditionExpression=Key('AnalysisId').eq(analyze_id)
-        )
-
-        suggestions = [
-            Suggestion(
-                id=item['SuggestionId'],
-                analyzer_id=item['AnalysisId'],
-                file_path=item['FilePath'],
-                analyzer=AnalyzerEnum(item['Analyzer']),
-                description=item['Description'],
-                start_line=int(item['StartLine']),
-                end_line=int(item['EndLine']),
-                original_snippet=item['OriginalSnippet'],
-                modified_code=item['ModifiedCode'],
-                difficulty_level=int(item['DifficultyLevel']),
-                additional_notes=item.get('AdditionalNotes'),
-                last= bool(item['Last']) if 'Last' in item else False
-            )
-            for item in response.get('Items', [])
-        ]
+        with tracer.start_as_current_span("dynamodb.query", kind=SpanKind.CLIENT, attributes={'analysis.id': analyze_id}):
+            items = suggestion_store.query_by_analysis(analyze_id)
+            # O processador grava o marcador de conclusão depois que todos os arquivos da análise terminam
+            completed = suggestion_store.is_analysis_done(analyze_id)
+
+        suggestions = [item_to_suggestion(item) for item in items]
     except Exception as e:
         error_trace = traceback.format_exc()
         print("Stack trace do erro:", error_trace)  
         raise HTTPException(status_code=500, detail=f"Erro ao processar itens: {str(e)}")
     
-    if not suggestions:
+    if not suggestions and not completed:
         raise HTTPException(status_code=204, detail="No suggestions found for this analysis ID yet.")
     
     return SuggestionsListOutput(
         id=analyze_id,
         suggestions=suggestions,
-        completed=any(suggestion.last for suggestion in suggestions)
+        completed=completed
     )
+
+
+@app.get("/suggestions", response_model=SuggestionsPage)
+def get_suggestions(
+    repo: str,
+    status: Optional[str] = None,
+    file_path: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=200),
+    next_token: Optional[str] = None
+):
+    """
+    Sugestões de um repositório em todas as análises, usando os índices RepoStatusIndex/RepoFileIndex.
+    Com file_path retorna o histórico do arquivo; caso contrário filtra opcionalmente por status (ex: pending).
+    O resultado é paginado: envie o next_token retornado para ler a próxima página.
+    """
+    try:
+        with tracer.start_as_current_span("dynamodb.query", kind=SpanKind.CLIENT, attributes={'analysis.repo': repo}):
+            if file_path:
+                items, next_page = suggestion_store.query_by_file(repo, file_path, status, limit=limit, next_token=next_token)
+            else:
+                items, next_page = suggestion_store.query_by_repo(repo, status, limit=limit, next_token=next_token)
+
+        return SuggestionsPage(suggestions=[item_to_suggestion(item) for item in items], next_token=next_page)
+    except InvalidPageTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Erro ao consultar sugestões do repositório {repo}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar itens: {str(e)}")